@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import contextlib
+import multiprocessing
+import chess.pgn
+from board import Board
+from searcher import Searcher
+from evaluate import color_multiplier
+from transposition_table import TranspositionTable, default_size_mb
+
+# Bulk analysis of PGN archives:
+#   python src/analyze_pgn.py games.pgn --depth 3 --workers 4 --output analysis.jsonl
+# Games are streamed from the PGN files one at a time and handed to a pool of worker processes through a bounded
+# queue, so the reader blocks (instead of loading the whole archive) when the workers fall behind. Workers emit one
+# JSON line per move through a second bounded queue, which blocks them if the writer falls behind.
+
+# Queued per worker, in both directions
+queue_size_per_worker = 4
+progress_interval = 5
+# Seconds between checks that the workers are still running, while waiting on a queue
+worker_poll_interval = 1
+
+def read_games(paths):
+    index = 0
+
+    for path in paths:
+        with open(path) as pgn:
+            while True:
+                game = chess.pgn.read_game(pgn)
+
+                if game is None:
+                    break
+
+                yield {
+                    'game': index,
+                    'white': game.headers.get('White'),
+                    'black': game.headers.get('Black'),
+                    'site': game.headers.get('Site'),
+                    'fen': game.board().fen(),
+                    'moves': [move.uci() for move in game.mainline_moves()]
+                }
+                index += 1
+
+def analyze_game(game, depth, transposition_table, soft_time_limit, hard_time_limit):
+    board = Board(game['fen'])
+
+    for ply, uci in enumerate(game['moves']):
+        searcher = Searcher(board, depth, transposition_table, soft_time_limit, hard_time_limit)
+        best_move = searcher.next_move()
+
+        yield {
+            'game': game['game'],
+            'white': game['white'],
+            'black': game['black'],
+            'site': game['site'],
+            'ply': ply,
+            'fen': board.fen(),
+            'played': uci,
+            'best_move': best_move.uci(),
+            'depth': searcher.completed_depth,
+            # from white's perspective
+            'eval': searcher.best_move_value * color_multiplier[board.turn]
+        }
+
+        board.push(board.parse_uci(uci))
+
+# Each worker keeps one transposition table, which is reused across the consecutive positions of its games
+def analysis_worker(games, records, depth, hash_size_mb, soft_time_limit, hard_time_limit):
+    transposition_table = TranspositionTable(hash_size_mb)
+
+    try:
+        # the searcher reports on stdout, which may be where the analysis goes
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for game in iter(games.get, None):
+                try:
+                    for record in analyze_game(game, depth, transposition_table, soft_time_limit, hard_time_limit):
+                        records.put(record)
+                except Exception as error:
+                    # the rest of the game is skipped, the next games are still analyzed
+                    records.put({ 'game': game['game'], 'white': game['white'], 'black': game['black'], 'site': game['site'], 'error': repr(error) })
+    finally:
+        records.put(None)
+
+# Puts item on the queue, unless all of the processes that take from it have exited (returns whether it was put)
+def put_while_alive(items, item, processes):
+    while True:
+        processes_alive = any(process.is_alive() for process in processes)
+
+        try:
+            items.put(item, timeout = worker_poll_interval)
+            return True
+        except queue.Full:
+            if not processes_alive:
+                return False
+
+def write_records(records, output, processes):
+    positions = 0
+    finished_workers = 0
+    tic = time.perf_counter()
+    last_report = tic
+
+    while finished_workers < len(processes):
+        workers_alive = any(process.is_alive() for process in processes)
+
+        try:
+            record = records.get(timeout = worker_poll_interval)
+        except queue.Empty:
+            # a worker that was killed never sends its end of records; once none is left, nothing else will come
+            if not workers_alive:
+                print(f"Analysis workers exited early, {len(processes) - finished_workers} of them without finishing", file = sys.stderr)
+                break
+            continue
+
+        if record is None:
+            finished_workers += 1
+            continue
+
+        output.write(json.dumps(record) + '\n')
+        positions += 1
+
+        now = time.perf_counter()
+        if now - last_report >= progress_interval:
+            last_report = now
+            output.flush()
+            print(f"Analyzed {positions} positions ({positions / (now - tic):0.2f} positions per second)", file = sys.stderr)
+
+    elapsed = time.perf_counter() - tic
+    print(f"Analyzed {positions} positions in {elapsed:0.4f} seconds ({positions / elapsed:0.2f} positions per second)", file = sys.stderr)
+
+def analyze(paths, output, depth, workers, hash_size_mb = default_size_mb, movetime = None):
+    time_limit = movetime / 1000 if movetime else None
+    games = multiprocessing.Queue(maxsize = workers * queue_size_per_worker)
+    records = multiprocessing.Queue(maxsize = workers * queue_size_per_worker)
+
+    processes = [
+        multiprocessing.Process(target = analysis_worker, args = (games, records, depth, hash_size_mb, time_limit, time_limit), daemon = True)
+        for _ in range(workers)
+    ]
+
+    for process in processes:
+        process.start()
+
+    writer = threading.Thread(target = write_records, args = (records, output, processes))
+    writer.start()
+
+    for game in read_games(paths):
+        if not put_while_alive(games, game, processes):
+            break
+
+    for _ in processes:
+        if not put_while_alive(games, None, processes):
+            break
+
+    writer.join()
+
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Annotate every move of the games in PGN files with the engine evaluation and best move, as JSON lines')
+    parser.add_argument('pgn', nargs = '+', help = 'PGN files to analyze')
+    parser.add_argument('--output', default = '-', help = 'JSONL file to write (default: stdout)')
+    parser.add_argument('--depth', type = int, default = 3, help = 'max search depth per position (default: 3)')
+    parser.add_argument('--movetime', type = int, help = 'time limit per position in milliseconds')
+    parser.add_argument('--workers', type = int, default = multiprocessing.cpu_count(), help = 'number of worker processes (default: number of cores)')
+    parser.add_argument('--hash', type = int, default = default_size_mb, help = f'transposition table size per worker in MB (default: {default_size_mb})')
+    args = parser.parse_args()
+
+    if args.output == '-':
+        analyze(args.pgn, sys.stdout, args.depth, args.workers, args.hash, args.movetime)
+    else:
+        with open(args.output, 'w') as output:
+            analyze(args.pgn, output, args.depth, args.workers, args.hash, args.movetime)
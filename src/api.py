@@ -1,41 +1,199 @@
+import os
 import json
+import threading
+from concurrent.futures import TimeoutError
 from searcher import Searcher
+from root_parallel import RootParallelPool, RootParallelSearcher
 from board import Board
-from transposition_table import TranspositionTable
-from flask import Flask, request, jsonify
+from transposition_table import TranspositionTable, Flag, export_json, default_size_mb
+from search_stats import SearchStats
+from tracer import SearchTracer, read_trace
+from opening_book import OpeningBook
+from engine_pool import EnginePool, EnginePoolFull
+from time_manager import allocate_time
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from json_encoder import JSONEncoder
+from evaluate import batch_evaluate
 
 app = Flask(__name__)
 CORS(app)
-app.config["DEBUG"] = True
+app.config["DEBUG"] = os.environ.get('FLASK_DEBUG') == '1'
 app.json_encoder = JSONEncoder
+# Default depth of /next_move, which a request can change with "depth" (up to max_request_depth) or "movetime" (ms)
 depth = 3
-transposition_table = TranspositionTable()
+max_request_depth = int(os.environ.get('MAX_REQUEST_DEPTH', 8))
+# Size of the transposition table (and of the table of each engine pool worker) in megabytes. When HASH_FILE is set,
+# the table is kept in that file, so that it is reused after a restart.
+transposition_table = TranspositionTable(int(os.environ.get('HASH_SIZE_MB', default_size_mb)), os.environ.get('HASH_FILE'))
+# When > 0, the root moves of /next_move are split across a pool of this many processes
+root_parallel_workers = int(os.environ.get('ROOT_PARALLEL_WORKERS', 0))
+root_parallel_pool = None
+# When set, the searches of /next_move (without root parallelism) collect statistics, exposed by /metrics
+search_stats = SearchStats() if os.environ.get('SEARCH_STATS') == '1' else None
+# When set, the searches of /next_move (without root parallelism) write their search tree to this file, served by /decision_tree
+trace_path = os.environ.get('SEARCH_TRACE')
+trace_max_ply = int(os.environ.get('SEARCH_TRACE_MAX_PLY', depth))
+# When set, /next_move answers positions in this polyglot book without searching
+opening_book = OpeningBook(os.environ['OPENING_BOOK']) if os.environ.get('OPENING_BOOK') else None
+# Serving mode: when > 0, /next_move is searched by a pool of this many engine processes (each with a warm table of its
+# own), with up to ENGINE_QUEUE_SIZE searches waiting for them; requests beyond that are turned away with a 503
+engine_workers = int(os.environ.get('ENGINE_WORKERS', 0))
+engine_pool = EnginePool(engine_workers, int(os.environ.get('ENGINE_QUEUE_SIZE', 16)), transposition_table.size_mb, search_stats is not None) if engine_workers > 0 else None
+# Largest page of /transposition_table
+max_export_page_size = 100000
+# Seconds a request waits for a pool search before it gets a 504
+request_timeout = float(os.environ.get('REQUEST_TIMEOUT', 60))
+# Without the pool, searches take turns on the shared transposition table
+search_lock = threading.Lock()
 
 @app.route('/next_move', methods=['POST'])
 def next_move():
+    global root_parallel_pool
+
     data = request.json
     fen = data.get('fen')
+    search_depth = data.get('depth')
+    movetime = data.get('movetime')
+
+    if search_depth is not None and not (isinstance(search_depth, int) and 0 < search_depth <= max_request_depth):
+        return jsonify({ "error": f"depth must be between 1 and {max_request_depth}" }), 400
+    if movetime is not None and not (isinstance(movetime, int) and movetime > 0):
+        return jsonify({ "error": "movetime must be a positive number of milliseconds" }), 400
+    # the root parallel search has a fixed depth, with no clock
+    if movetime is not None and root_parallel_workers > 0 and engine_pool is None:
+        return jsonify({ "error": "movetime is not supported with ROOT_PARALLEL_WORKERS, use depth" }), 400
+    if search_depth is None and movetime is None:
+        search_depth = depth
+
+    try:
+        board = Board(fen)
+    except ValueError as error:
+        return jsonify({ "error": str(error) }), 400
+
+    if not board.is_valid() or board.is_game_over():
+        return jsonify({ "error": f"No move to search in {fen}" }), 400
+
+    book_move = opening_book.probe(board) if opening_book is not None else None
+    if book_move is not None:
+        return jsonify({ "move": str(book_move) })
+
+    if engine_pool is not None:
+        try:
+            result = engine_pool.search(fen, search_depth, movetime, request_timeout)
+        except ValueError as error:
+            return jsonify({ "error": str(error) }), 400
+        except EnginePoolFull:
+            return jsonify({ "error": "Too many searches in progress" }), 503, { 'Retry-After': '1' }
+        except TimeoutError:
+            return jsonify({ "error": "The search did not finish in time" }), 504
+        except RuntimeError as error:
+            # the search failed, or its worker died (and was replaced)
+            return jsonify({ "error": str(error) }), 500
+
+        return jsonify(result)
 
-    board = Board(fen)
-    move = Searcher(board, depth, transposition_table).next_move()
+    soft_time_limit, hard_time_limit = allocate_time(board.turn, movetime = movetime) if movetime else ( None, None )
+    search_depth = search_depth or max_request_depth
+
+    with search_lock:
+        if root_parallel_workers > 0:
+            if root_parallel_pool is None:
+                root_parallel_pool = RootParallelPool(transposition_table, root_parallel_workers)
+
+            move = RootParallelSearcher(board, search_depth, root_parallel_pool).next_move()
+        else:
+            stats = SearchStats() if search_stats is not None else None
+            tracer = SearchTracer(trace_path, trace_max_ply) if trace_path else None
+            move = Searcher(board, search_depth, transposition_table, soft_time_limit, hard_time_limit, stats = stats, tracer = tracer).next_move()
+
+            if tracer is not None:
+                tracer.close()
+
+            if stats is not None:
+                search_stats.merge(stats)
 
     return jsonify({ "move": str(move) })
 
+# Static evaluation (from white's perspective) of many positions at once
+@app.route('/evaluate', methods=['POST'])
+def evaluate():
+    fens = (request.get_json(silent = True) or {}).get('fens')
+
+    if not isinstance(fens, list) or not fens or not all(isinstance(fen, str) for fen in fens):
+        return jsonify({ "error": "fens must be a non-empty list of FEN strings" }), 400
+
+    try:
+        boards = [Board(fen) for fen in fens]
+    except ValueError as error:
+        return jsonify({ "error": str(error) }), 400
+
+    return jsonify({ "values": batch_evaluate(boards).tolist() })
+
+# Search statistics totals in the Prometheus text format
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if search_stats is None:
+        return Response("Search statistics are disabled (set SEARCH_STATS=1)\n", status = 404, mimetype = 'text/plain')
+
+    stats = engine_pool.stats if engine_pool is not None else search_stats
+
+    return Response(stats.prometheus(), mimetype = 'text/plain; version=0.0.4')
+
+# One page of the table entries, e.g. /transposition_table?cursor=0&limit=1000&min_depth=2&flag=EXACT&format=ndjson
+# The cursor of the next page is sent in the X-Next-Cursor header (empty after the last page). Formats: ndjson (one
+# entry per line, as HashEntry.json) or binary (the packed records of transposition_table.export_record)
 @app.route('/transposition_table', methods=['GET'])
 def get_transposition_table():
-    table = getattr(transposition_table, 'table')
-    json_table = list(map(lambda x: x.json(), filter(lambda entry: entry is not None, table)))
+    cursor = request.args.get('cursor', 0, type = int)
+    limit = request.args.get('limit', 1000, type = int)
+    min_depth = request.args.get('min_depth', type = int)
+    max_depth = request.args.get('max_depth', type = int)
+    flag = request.args.get('flag')
+    export_format = request.args.get('format', 'ndjson')
+
+    if cursor < 0:
+        return jsonify({ "error": "cursor must not be negative" }), 400
+    if not 0 < limit <= max_export_page_size:
+        return jsonify({ "error": f"limit must be between 1 and {max_export_page_size}" }), 400
+    if flag is not None and flag.upper() not in Flag.__members__:
+        return jsonify({ "error": f"flag must be one of {', '.join(Flag.__members__)}" }), 400
+    if export_format not in ['ndjson', 'binary']:
+        return jsonify({ "error": "format must be ndjson or binary" }), 400
 
-    return jsonify(json_table)
+    records, next_cursor = transposition_table.export_page(cursor, limit, min_depth, max_depth, Flag[flag.upper()] if flag else None)
+    headers = { 'X-Next-Cursor': '' if next_cursor is None else str(next_cursor) }
 
+    if export_format == 'binary':
+        return Response(records.tobytes(), mimetype = 'application/octet-stream', headers = headers)
+
+    lines = (json.dumps(entry) + '\n' for entry in export_json(records))
+
+    return Response(lines, mimetype = 'application/x-ndjson', headers = headers)
+
+# Fill rate, depth histogram and flag mix of the table
+@app.route('/transposition_table/summary', methods=['GET'])
+def get_transposition_table_summary():
+    return jsonify(transposition_table.summary())
+
+# Nodes of the last traced search, as a JSON array that is streamed from the trace file (optionally up to ?max_ply=N)
 @app.route('/decision_tree', methods=['GET'])
 def get_decision_tree():
-    with open('tree.json') as f:
-        data = json.load(f)
+    if not trace_path or not os.path.exists(trace_path):
+        return jsonify({ "error": "No search trace (set SEARCH_TRACE to a file path)" }), 404
+
+    max_ply = request.args.get('max_ply', type = int)
+
+    def stream_nodes():
+        yield '['
+        for index, node in enumerate(read_trace(trace_path, max_ply)):
+            yield (',' if index else '') + json.dumps(node)
+        yield ']'
 
-    return jsonify(data)
+    return Response(stream_nodes(), mimetype = 'application/json')
 
 
-app.run()
+# Development server; in production, serve the app with a WSGI server in one process (the engine pool is the
+# parallelism), e.g. ENGINE_WORKERS=4 gunicorn --chdir src --threads 16 api:app
+if __name__ == '__main__':
+    app.run(threaded = True)
@@ -0,0 +1,147 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+from board import Board
+from searcher import Searcher
+from search_stats import SearchStats
+from transposition_table import TranspositionTable, default_size_mb
+
+# Fixed-depth search benchmark:
+#   python src/bench.py --depth 3 --output bench.json
+#   python src/bench.py --depth 3 --baseline bench.json
+# Every position is searched single-threaded with a fresh transposition table and move history, so node counts are
+# deterministic: a change in nodes means the search changed, while a change in nodes per second at equal nodes is a
+# speed regression (or improvement).
+
+# The positions of src/tests/next_move.py
+next_move_positions = [
+    '1r3rk1/p1p3pp/3bp3/1p1P1q2/P3pP2/2B1P2P/1P4Q1/4K1NR b K - 0 1',
+    '1r1qr3/pppbbQ1k/2n1p1p1/2PpP3/3P4/2P2N2/P1B2PP1/1RB1K3 b - - 0 1',
+    'r5rk/5p1p/5R2/4B3/8/8/7P/7K w - - 0 1',
+    '2r3k1/6p1/5p1p/p2r4/3p4/6B1/PPP2PPP/R3R1K1 w - - 0 1'
+]
+
+# Positions the engine has played badly, one FEN per line (with # comments)
+problematic_positions_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'problematic_positions')
+
+def read_positions(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+problematic_positions = read_positions(problematic_positions_path)
+
+# A selection of the Stockfish bench positions
+standard_positions = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r3k2r/2pb1ppp/2pp1q2/p7/1nP1B3/1P2P3/P2N1PPP/R2QK2R w KQkq a6 0 14',
+    '4rrk1/2p1b1p1/p1p3q1/4p3/2P2n1p/1P1NR2P/PB3PP1/3R1QK1 b - - 2 24',
+    '6k1/1R3p2/6p1/2Bp3p/3P2q1/P7/1P2rQ1K/5R2 b - - 4 44',
+    '8/8/1p2k1p1/3p3p/1p1P1P1P/1P2PK2/8/8 w - - 3 54',
+    'r1bq1rk1/pp2b1pp/n1pp1n2/3P1p2/2P1p3/2N1P2N/PP2BPPP/R1BQ1RK1 b - - 2 10',
+    '3r3k/2r4p/1p1b3q/p4P2/P2Pp3/1B2P3/3BQ1RP/6K1 w - - 3 87'
+]
+
+bench_suites = {
+    'next_move': next_move_positions,
+    'problematic': problematic_positions,
+    'standard': standard_positions
+}
+
+def bench_position(fen, depth, hash_size_mb = default_size_mb):
+    stats = SearchStats()
+    searcher = Searcher(Board(fen), depth, TranspositionTable(hash_size_mb), stats = stats)
+
+    tic = time.perf_counter()
+    # the searcher reports on stdout, which is where the results go
+    with contextlib.redirect_stdout(io.StringIO()):
+        move = searcher.next_move()
+    elapsed = time.perf_counter() - tic
+
+    result = {
+        'fen': fen,
+        'best_move': move.uci(),
+        'value': searcher.best_move_value,
+        'seconds': round(elapsed, 4),
+        'nodes_per_second': round(stats.total_nodes() / elapsed) if elapsed > 0 else None
+    }
+    result.update(stats.json())
+
+    return result
+
+def summarize(results):
+    nodes = sum(result['nodes'] for result in results)
+    quiescence_nodes = sum(result['quiescence_nodes'] for result in results)
+    seconds = sum(result['seconds'] for result in results)
+    probes = sum(result['tt_probes'] for result in results)
+    hits = sum(result['tt_hit_rate'] * result['tt_probes'] for result in results)
+    cutoffs = sum(result['tt_cutoff_rate'] * result['tt_probes'] for result in results)
+
+    return {
+        'positions': len(results),
+        'nodes': nodes,
+        'seconds': round(seconds, 4),
+        'nodes_per_second': round(nodes / seconds) if seconds > 0 else None,
+        'quiescence_share': round(quiescence_nodes / nodes, 4) if nodes else 0,
+        'tt_hit_rate': round(hits / probes, 4) if probes else 0,
+        'tt_cutoff_rate': round(cutoffs / probes, 4) if probes else 0
+    }
+
+def run_bench(depth, suites, hash_size_mb = default_size_mb):
+    results = []
+
+    for suite in suites:
+        for fen in bench_suites[suite]:
+            result = bench_position(fen, depth, hash_size_mb)
+            result['suite'] = suite
+            results.append(result)
+            print(f"{suite} {fen}: {result['nodes']} nodes in {result['seconds']} seconds", file = sys.stderr)
+
+    return {
+        'depth': depth,
+        'total': summarize(results),
+        'positions': results
+    }
+
+# Positions whose node count differs from a previous run (at the same depth)
+def compare_to_baseline(report, baseline):
+    baseline_nodes = { (result['suite'], result['fen']): result['nodes'] for result in baseline['positions'] }
+    changes = []
+
+    for result in report['positions']:
+        expected = baseline_nodes.get((result['suite'], result['fen']))
+
+        if expected is not None and expected != result['nodes']:
+            changes.append({ 'suite': result['suite'], 'fen': result['fen'], 'baseline_nodes': expected, 'nodes': result['nodes'] })
+
+    return changes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Search a fixed set of positions to a fixed depth and report nodes, speed and search statistics as JSON')
+    parser.add_argument('--depth', type = int, default = 3, help = 'search depth (default: 3)')
+    parser.add_argument('--suite', nargs = '+', choices = list(bench_suites), default = list(bench_suites), help = 'position sets to run (default: all)')
+    parser.add_argument('--hash', type = int, default = default_size_mb, help = f'transposition table size in MB (default: {default_size_mb})')
+    parser.add_argument('--output', default = '-', help = 'JSON file to write (default: stdout)')
+    parser.add_argument('--baseline', help = 'JSON output of a previous run, to compare node counts and speed with')
+    args = parser.parse_args()
+
+    report = run_bench(args.depth, args.suite, args.hash)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        report['baseline'] = {
+            'nodes_per_second': baseline['total']['nodes_per_second'],
+            'changed_node_counts': compare_to_baseline(report, baseline) if baseline['depth'] == args.depth else None
+        }
+
+    if args.output == '-':
+        print(json.dumps(report, indent = 4))
+    else:
+        with open(args.output, 'w') as output:
+            output.write(json.dumps(report, indent = 4))
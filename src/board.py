@@ -1,64 +1,203 @@
 import chess
-import numpy as np
-from evaluate import piece_values, get_position_value, color_multiplier
-
-def initialize_piece_count():
-    return {
-        chess.PAWN: 0,
-        chess.ROOK: 0,
-        chess.KNIGHT: 0,
-        chess.BISHOP: 0,
-        chess.QUEEN: 0,
-        chess.KING: 0
-    }
-
-def no_queen_or_at_most_one_minor_piece(piece_count, color):
-    counts = piece_count[color]
-
-    return counts[chess.QUEEN] == 0 or (counts[chess.BISHOP] + counts[chess.KNIGHT] <= 1)
+import chess.polyglot
+from evaluate import get_piece_square_value, get_king_endgame_adjustment, taper, phase_weights
+from zobrist import piece_key, pawn_hash, state_key, initial_state_key
 
 class Board(chess.Board):
-    def __init__(self, *args):
-        super(Board, self).__init__(*args)
-        self.is_endgame = self.__is_endgame()
+    # When enabled, the incrementally maintained score and keys are checked against a full recomputation after every push/pop
+    debug = False
 
+    # The running score (middlegame tables), king endgame adjustment and phase are kept up to date by push/pop, so this is O(1)
     def value(self):
-        board_value = 0
-
-        for square in chess.SQUARES:
-            piece = self.piece_at(square)
-
-            if not piece:
-                continue
-
-            color = piece.color
-            piece_type = piece.piece_type
-
-            value = piece_values[piece_type] + get_position_value(piece_type, color, square, self.is_endgame)
-
-            board_value += value * color_multiplier[color]
-
-        return board_value
-
-    # For now, set the endgame status when the board is initialized (at the root of the search tree), and use that to calculate position values
-    # is there a faster way to check this?
-    # once the board becomes "endgame", we shouldn't need to check it again (unless moves were popped off)
-    # could short-circuit as soon as we know it's not endgame (2 queens seen, etc)
-    def __is_endgame(self):
-        piece_count = {
-            chess.WHITE: initialize_piece_count(),
-            chess.BLACK: initialize_piece_count()
-        }
-
-        for square in chess.SQUARES:
-            piece = self.piece_at(square)
-
-            if not piece:
-                continue
+        return taper(self.score, self.king_adjustment, self.phase)
 
-            color = piece.color
-            piece_type = piece.piece_type
+    # Each side has no queen, or at most one minor piece (read from the live bitboards, so it follows set_fen and push/pop)
+    @property
+    def is_endgame(self):
+        minors = self.knights | self.bishops
 
-            piece_count[color][piece_type] += 1
+        return all(not self.queens & self.occupied_co[color] or chess.popcount(minors & self.occupied_co[color]) <= 1 for color in chess.COLORS)
+
+    # Full recomputation of the board value, used to seed (and verify) the running state
+    def evaluate(self):
+        score, king_adjustment, phase = self.__count()
+
+        return taper(score, king_adjustment, phase)
 
-        return no_queen_or_at_most_one_minor_piece(piece_count, chess.WHITE) and no_queen_or_at_most_one_minor_piece(piece_count, chess.BLACK)
+    def __count(self):
+        score = 0
+        king_adjustment = 0
+        phase = 0
+
+        for square, piece in self.piece_map().items():
+            score += get_piece_square_value(piece.piece_type, piece.color, square, False)
+            phase += phase_weights[piece.piece_type]
+
+            if piece.piece_type == chess.KING:
+                king_adjustment += get_king_endgame_adjustment(piece.color, square)
+
+        return ( score, king_adjustment, phase )
+
+    # Number of earlier occurrences of the current position, found by comparing zobrist keys. Only the positions since
+    # the last capture or pawn move (counted by the halfmove clock) with the same side to move can be the same.
+    # Positions from before the board was last set up (e.g. with set_fen) are not known.
+    def repetitions(self):
+        keys = self._key_stack
+        zobrist = self.zobrist
+        count = 0
+
+        for index in range(len(keys) - 2, max(len(keys) - self.halfmove_clock, 0) - 1, -2):
+            if keys[index] == zobrist:
+                count += 1
+
+        return count
+
+    # Cheap replacement for can_claim_draw(): threefold repetition or the fifty-move rule (checkmate must be checked first)
+    def is_repetition_or_fifty_moves(self):
+        return self.halfmove_clock >= 100 or self.repetitions() >= 2
+
+    def push(self, move):
+        self._state_stack.append((self.score, self.king_adjustment, self.phase, self.pawn_zobrist, self._state_key))
+        self._key_stack.append(self.zobrist)
+        self.__update_for_move(move)
+
+        super(Board, self).push(move)
+
+        self._state_key = state_key(self)
+        self.zobrist ^= self._state_key
+
+        if self.debug:
+            self.__verify()
+
+    def pop(self):
+        move = super(Board, self).pop()
+        self.score, self.king_adjustment, self.phase, self.pawn_zobrist, self._state_key = self._state_stack.pop()
+        self.zobrist = self._key_stack.pop()
+
+        if self.debug:
+            self.__verify()
+
+        return move
+
+    # python-chess calls clear_stack whenever the position is set up from scratch (set_fen, reset, set_piece_at, etc.)
+    def clear_stack(self):
+        super(Board, self).clear_stack()
+        self.__reset_state()
+
+    # The root position is restored without clearing the stack of the new board
+    def root(self):
+        board = super(Board, self).root()
+        board.__reset_state()
+
+        return board
+
+    # python-chess sets the castling rights and en passant square (and for a mirror, the piece colors and turn) after
+    # clearing the stack, so the state is computed again once the board has been transformed
+    def apply_transform(self, f):
+        super(Board, self).apply_transform(f)
+        self.__reset_state()
+
+    def apply_mirror(self):
+        super(Board, self).apply_mirror()
+        self.__reset_state()
+
+    # Recompute the running score, phase and keys of the current position from scratch
+    def __reset_state(self):
+        self.score, self.king_adjustment, self.phase = self.__count()
+        self._state_key = initial_state_key(self)
+        self.zobrist = chess.polyglot.zobrist_hash(self)
+        self.pawn_zobrist = pawn_hash(self)
+        self._state_stack = []
+        self._key_stack = []
+
+    def copy(self, *args, **kwargs):
+        board = super(Board, self).copy(*args, **kwargs)
+        board.score = self.score
+        board.king_adjustment = self.king_adjustment
+        board.phase = self.phase
+        board.zobrist = self.zobrist
+        board.pawn_zobrist = self.pawn_zobrist
+        board._state_key = self._state_key
+        board._state_stack = self._state_stack[-len(board.move_stack):] if board.move_stack else []
+        board._key_stack = self._key_stack[-len(board.move_stack):] if board.move_stack else []
+
+        return board
+
+    # Apply the change in board value (from white's perspective), game phase and the piece placement part of the zobrist keys
+    # caused by making the move; must be called before the move is pushed
+    def __update_for_move(self, move):
+        # the castling, en passant and turn components are rehashed once the move has been made
+        self.zobrist ^= self._state_key
+
+        if not move:
+            return
+
+        color = self.turn
+        from_square = move.from_square
+        to_square = move.to_square
+        piece_type = self.piece_type_at(from_square)
+
+        value_change = -get_piece_square_value(piece_type, color, from_square, False)
+        key_change = piece_key(piece_type, color, from_square)
+        pawn_key_change = 0
+        king_adjustment_change = 0
+        phase_change = 0
+
+        if piece_type == chess.KING and self.is_castling(move):
+            rank = chess.square_rank(from_square)
+            kingside = self.is_kingside_castling(move)
+            king_to = chess.square(6 if kingside else 2, rank)
+            rook_to = chess.square(5 if kingside else 3, rank)
+            # chess960-style castling moves encode the rook square as the destination
+            if self.piece_type_at(to_square) == chess.ROOK:
+                rook_from = to_square
+            else:
+                rook_from = chess.square(7 if kingside else 0, rank)
+
+            value_change += get_piece_square_value(chess.KING, color, king_to, False)
+            king_adjustment_change = get_king_endgame_adjustment(color, king_to) - get_king_endgame_adjustment(color, from_square)
+            value_change -= get_piece_square_value(chess.ROOK, color, rook_from, False)
+            value_change += get_piece_square_value(chess.ROOK, color, rook_to, False)
+            key_change ^= piece_key(chess.KING, color, king_to) ^ piece_key(chess.ROOK, color, rook_from) ^ piece_key(chess.ROOK, color, rook_to)
+        else:
+            captured_piece_type = self.piece_type_at(to_square)
+            if captured_piece_type:
+                value_change -= get_piece_square_value(captured_piece_type, not color, to_square, False)
+                key_change ^= piece_key(captured_piece_type, not color, to_square)
+                phase_change -= phase_weights[captured_piece_type]
+                if captured_piece_type == chess.PAWN:
+                    pawn_key_change ^= piece_key(chess.PAWN, not color, to_square)
+            elif piece_type == chess.PAWN and to_square == self.ep_square:
+                capture_square = to_square - 8 if color == chess.WHITE else to_square + 8
+                value_change -= get_piece_square_value(chess.PAWN, not color, capture_square, False)
+                key_change ^= piece_key(chess.PAWN, not color, capture_square)
+                pawn_key_change ^= piece_key(chess.PAWN, not color, capture_square)
+
+            placed_piece_type = move.promotion or piece_type
+            value_change += get_piece_square_value(placed_piece_type, color, to_square, False)
+            key_change ^= piece_key(placed_piece_type, color, to_square)
+            phase_change += phase_weights[placed_piece_type] - phase_weights[piece_type]
+
+            if piece_type == chess.KING:
+                king_adjustment_change = get_king_endgame_adjustment(color, to_square) - get_king_endgame_adjustment(color, from_square)
+            elif piece_type == chess.PAWN:
+                pawn_key_change ^= piece_key(chess.PAWN, color, from_square)
+                if placed_piece_type == chess.PAWN:
+                    pawn_key_change ^= piece_key(chess.PAWN, color, to_square)
+
+        self.score += value_change
+        self.king_adjustment += king_adjustment_change
+        self.phase += phase_change
+        self.zobrist ^= key_change
+        self.pawn_zobrist ^= pawn_key_change
+
+    def __verify(self):
+        expected = self.__count()
+
+        if (self.score, self.king_adjustment, self.phase) != expected:
+            raise AssertionError(f"Running score, king adjustment and phase {(self.score, self.king_adjustment, self.phase)} do not match full evaluation {expected} for {self.fen()}")
+
+        expected = chess.polyglot.zobrist_hash(self)
+
+        if self.zobrist != expected or self.pawn_zobrist != pawn_hash(self):
+            raise AssertionError(f"Running zobrist key {self.zobrist} does not match full hash {expected} for {self.fen()}")
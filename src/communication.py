@@ -1,9 +1,104 @@
 import sys
 import chess
 import argparse
+import threading
 from searcher import Searcher
+from lazy_smp import LazySMPSearcher, lazy_smp_supported
 from board import Board
-from transposition_table import TranspositionTable
+from transposition_table import TranspositionTable, default_size_mb
+from time_manager import allocate_time
+from move_sorter import MoveHistory
+from search_stats import SearchStats
+from tracer import SearchTracer, default_trace_path
+from opening_book import OpeningBook, default_max_book_ply, book_selections
+
+# Depth limit for searches that are bounded by the clock instead
+max_depth = 64
+
+# UCI options that are not stored elsewhere, changed with setoption
+options = {
+    'Threads': 1,
+    # collect search statistics, reported as "info string" lines after each iteration
+    'SearchStats': False,
+    # write the searched nodes to TraceFile (see tracer.py), keeping those within TraceMaxPly plies of the root,
+    # with at least TraceMinDepth depth left, and TraceSampleRate percent of those
+    'Trace': False,
+    'TraceFile': default_trace_path,
+    'TraceMaxPly': max_depth,
+    'TraceMinDepth': -6,
+    'TraceSampleRate': 100,
+    # the GUI may send "go ponder" to search the expected reply on the opponent's time
+    'Ponder': False,
+    # play moves from the polyglot book BookFile, for the first BookMaxPly plies of the game
+    'OwnBook': False,
+    'BookFile': '',
+    'BookMaxPly': default_max_book_ply,
+    'BookSelection': book_selections[0]
+}
+
+# Opened from the Book options by load_opening_book, when OwnBook is set
+opening_book = None
+
+# The search started by the last go command (a SearchThread)
+search_thread = None
+
+# A search running on a worker thread, so that the UCI loop keeps reading commands while the engine thinks: isready is
+# answered right away, stop ends the search (through the stop_event checked by negamax), and ponderhit starts the clock
+# of a ponder search. A ponder or infinite search that finishes early holds its best move back until stop or ponderhit.
+class SearchThread:
+    def __init__(self, searcher, stop_event, board, tracer = None, wait_for_stop = False, ponderhit_time_limits = ( None, None )):
+        self.searcher = searcher
+        self.stop_event = stop_event
+        self.board = board
+        self.tracer = tracer
+        self.ponderhit_time_limits = ponderhit_time_limits
+        # a search that fails may leave its moves on the board
+        self.root_ply = len(board.move_stack)
+        self.released = threading.Event()
+        if not wait_for_stop:
+            self.released.set()
+
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+    # The GUI waits for a bestmove, so one is always sent: 0000 (the null move) when the search failed
+    def run(self):
+        move = None
+        ponder_move = None
+
+        try:
+            move = self.searcher.next_move()
+            ponder_move = get_ponder_move(self.board, move, self.searcher.principal_variation)
+        except Exception as error:
+            print(f"info string search failed: {error!r}", flush = True)
+
+            while len(self.board.move_stack) > self.root_ply:
+                self.board.pop()
+        finally:
+            if self.tracer is not None:
+                self.tracer.close()
+
+        self.released.wait()
+
+        print(f"bestmove {move if move is not None else '0000'}" + (f" ponder {ponder_move}" if ponder_move is not None else ''), flush = True)
+
+    # the opponent played the move that was pondered on, so the search continues on our own clock
+    def ponderhit(self):
+        if not self.released.is_set():
+            self.searcher.start_clock(*self.ponderhit_time_limits)
+            self.released.set()
+
+    # waits for a search with limits to end, ponder and infinite searches are stopped
+    def finish(self):
+        if self.released.is_set():
+            self.thread.join()
+        else:
+            self.stop()
+
+    def stop(self):
+        self.stop_event.set()
+        self.released.set()
+        self.thread.join()
 
 # UCI gist: https://gist.github.com/aliostad/f4470274f39d29b788c1b09519e67372
 def talk():
@@ -12,35 +107,122 @@ def talk():
     This implements a slice of the UCI protocol.
     '''
     board = Board()
-    depth = get_depth()
-    transposition_table = TranspositionTable()
+    arguments = get_arguments()
+    depth = arguments.depth
+    transposition_table = TranspositionTable(path = arguments.hash_file)
+
+    if arguments.book:
+        options['OwnBook'] = True
+        options['BookFile'] = arguments.book
+        load_opening_book()
+    move_history = MoveHistory()
+
+    # Commands are read through a file object of their own: a parallel search forks its helper processes from the
+    # search thread while this one waits for input, and the helpers close sys.stdin, which blocks on a lock held here
+    commands = open(sys.stdin.fileno(), closefd = False)
 
     while True:
-        msg = input()
+        line = commands.readline()
+        msg = line.strip()
+
+        # at the end of the input (e.g. commands piped in), the last search is allowed to finish
+        if not line:
+            if search_thread is not None:
+                search_thread.finish()
+            msg = 'quit'
+
         print(f'>>> {msg}', file=sys.stderr)
         
         if (msg == 'quit'):
+            stop_search()
             break
 
-        command(board, depth, transposition_table, msg)
+        command(board, depth, transposition_table, msg, move_history)
+
+    # frees the shared memory, if a parallel search was used, or writes the table file
+    transposition_table.release()
 
 
-def command(board, depth, transposition_table, msg):
+def command(board, depth, transposition_table, msg, move_history = None):
     '''
     Accept UCI commands and respond.
     The board state is also updated.
     '''
+    global search_thread
+
+    # while a search runs, it owns the board: only isready, stop and ponderhit are handled alongside it, anything else
+    # (which the GUI should only send after stop) waits for it to end
+    if msg == 'stop':
+        stop_search()
+        return
+
+    if msg == 'ponderhit':
+        if search_thread is not None:
+            search_thread.ponderhit()
+        return
+
+    if msg != 'isready':
+        stop_search()
+
     if msg == 'uci':
         print("id name brandobot")
         print("id author Brandon Ransom")
+        print(f"option name Hash type spin default {default_size_mb} min 1 max 4096")
+        print("option name HashFile type string default <empty>")
+        print("option name Threads type spin default 1 min 1 max 64")
+        print("option name SearchStats type check default false")
+        print("option name Trace type check default false")
+        print(f"option name TraceFile type string default {default_trace_path}")
+        print(f"option name TraceMaxPly type spin default {max_depth} min 0 max {max_depth}")
+        print("option name TraceMinDepth type spin default -6 min -6 max 64")
+        print("option name TraceSampleRate type spin default 100 min 1 max 100")
+        print("option name Ponder type check default false")
+        print("option name OwnBook type check default false")
+        print("option name BookFile type string default <empty>")
+        print(f"option name BookMaxPly type spin default {default_max_book_ply} min 0 max 1000")
+        print(f"option name BookSelection type combo default {book_selections[0]} " + ' '.join(f"var {selection}" for selection in book_selections))
         print("uciok")
         return
 
     if msg == 'isready':
-        print('readyok')
+        print('readyok', flush = True)
         return
 
     if msg == 'ucinewgame':
+        transposition_table.flush()
+        return
+
+    if msg.startswith('setoption name Hash value'):
+        transposition_table.resize(int(msg.split(' ')[4]))
+        return
+
+    # e.g. "setoption name HashFile value /var/lib/chess-ai/hash.bin" ("<empty>" keeps the table in memory only)
+    if msg.startswith('setoption name HashFile value'):
+        path = ' '.join(msg.split(' ')[4:])
+        transposition_table.set_path(None if path in ['', '<empty>'] else path)
+        return
+
+    if msg.startswith('setoption name Threads value'):
+        threads = int(msg.split(' ')[4])
+
+        if threads > 1 and not lazy_smp_supported:
+            print("info string Threads > 1 needs python 3.8+ (multiprocessing.shared_memory), searching with 1 thread", flush = True)
+            threads = 1
+
+        options['Threads'] = threads
+        return
+
+    if msg.startswith('setoption name SearchStats value'):
+        options['SearchStats'] = msg.split(' ')[4] == 'true'
+        return
+
+    if msg.startswith('setoption name Trace') or msg.startswith('setoption name Ponder'):
+        set_option(msg)
+        return
+
+    if msg.startswith('setoption name OwnBook') or msg.startswith('setoption name Book'):
+        set_option(msg)
+        load_opening_book()
         return
 
     if 'position startpos moves' in msg:
@@ -57,11 +239,43 @@ def command(board, depth, transposition_table, msg):
         return
 
     if msg[0:2] == 'go':
-        if board.is_endgame:
-            move = Searcher(board, depth + 4, transposition_table).next_move()
+        # "go ponder" searches the position after the expected reply until ponderhit or stop, "go infinite" until stop
+        pondering = 'ponder' in msg.split(' ')
+        infinite = 'infinite' in msg.split(' ')
+
+        # known positions are answered from the book, without searching (a ponder search has to wait for ponderhit)
+        book_move = opening_book.probe(board) if opening_book is not None and not pondering else None
+        if book_move is not None:
+            print(f"bestmove {book_move}", flush = True)
+            return
+
+        arguments = parse_go_arguments(msg)
+        search_depth = arguments.pop('depth', None)
+        soft_time_limit, hard_time_limit = allocate_time(board.turn, **arguments)
+        ponderhit_time_limits = ( soft_time_limit, hard_time_limit )
+
+        if pondering or infinite:
+            soft_time_limit, hard_time_limit = None, None
+
+        if search_depth is None:
+            if hard_time_limit is not None or pondering or infinite:
+                search_depth = max_depth
+            elif board.is_endgame:
+                search_depth = depth + 4
+            else:
+                search_depth = depth
+
+        stats = SearchStats() if options['SearchStats'] else None
+        tracer = create_tracer() if options['Trace'] else None
+        stop_event = threading.Event()
+
+        if options['Threads'] > 1:
+            searcher = LazySMPSearcher(board, search_depth, transposition_table, soft_time_limit, hard_time_limit, options['Threads'], move_history, stats, tracer, stop_event)
         else:
-            move = Searcher(board, depth, transposition_table).next_move()
-        print(f"bestmove {move}")
+            searcher = Searcher(board, search_depth, transposition_table, soft_time_limit, hard_time_limit, stop_event = stop_event, move_history = move_history, stats = stats, tracer = tracer)
+
+        searcher.uci_info = True
+        search_thread = SearchThread(searcher, stop_event, board, tracer, pondering or infinite, ponderhit_time_limits)
         return
 
     if msg == 'test':
@@ -70,12 +284,80 @@ def command(board, depth, transposition_table, msg):
         print(f"{move}")
         return
 
-def get_depth():
+# Stops the running search, if any, which prints its best move, and waits for it
+def stop_search():
+    global search_thread
+
+    if search_thread is not None:
+        search_thread.stop()
+        search_thread = None
+
+# The second move of the principal variation, if it is a legal reply to the best move
+def get_ponder_move(board, move, principal_variation):
+    if move is None or len(principal_variation) < 2 or principal_variation[0] != move.uci():
+        return None
+
+    reply = chess.Move.from_uci(principal_variation[1])
+    board.push(move)
+    is_legal = board.is_legal(reply)
+    board.pop()
+
+    return reply if is_legal else None
+
+# e.g. "setoption name TraceMaxPly value 2"; values are converted to the type of the option's default
+def set_option(msg):
+    tokens = msg.split(' ')
+    name = tokens[2]
+    value = ' '.join(tokens[4:])
+
+    if name not in options:
+        return
+
+    if isinstance(options[name], bool):
+        options[name] = value == 'true'
+    elif isinstance(options[name], int):
+        options[name] = int(value)
+    else:
+        options[name] = '' if value == '<empty>' else value
+
+def load_opening_book():
+    global opening_book
+
+    if opening_book is not None:
+        opening_book.close()
+        opening_book = None
+
+    if options['OwnBook'] and options['BookFile']:
+        opening_book = OpeningBook(options['BookFile'], options['BookSelection'], options['BookMaxPly'])
+
+def create_tracer():
+    return SearchTracer(options['TraceFile'], options['TraceMaxPly'], options['TraceMinDepth'], options['TraceSampleRate'] / 100)
+
+# e.g. "go wtime 300000 btime 300000 winc 2000 binc 2000" -> { 'wtime': 300000, 'btime': 300000, 'winc': 2000, 'binc': 2000 }
+def parse_go_arguments(msg):
+    tokens = msg.split(' ')[1:]
+    arguments = {}
+
+    for name in ['wtime', 'btime', 'winc', 'binc', 'movestogo', 'movetime', 'depth']:
+        if name in tokens:
+            arguments[name] = int(tokens[tokens.index(name) + 1])
+
+    return arguments
+
+def get_arguments():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         '--depth',
+        type=int,
         default=3,
         help='provide an integer (default: 3)'
     )
-    args = parser.parse_args()
-    return int(args.depth)
+    parser.add_argument(
+        '--book',
+        help='play moves from this polyglot opening book (same as the UCI options OwnBook and BookFile)'
+    )
+    parser.add_argument(
+        '--hash-file',
+        help='keep the transposition table in this file, so that it is reused after a restart'
+    )
+    return parser.parse_args()
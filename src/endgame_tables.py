@@ -0,0 +1,294 @@
+import os
+import sys
+import time
+import argparse
+import functools
+import chess
+import numpy as np
+
+# Endgame tables for king and pawn vs king (KPK) and king and rook vs king (KRK), which know the outcome of every
+# position, so the search can score these endings exactly without searching them:
+#   KPK: one bit per position, whether the side with the pawn wins (every other position is a draw)
+#   KRK: the number of plies to mate, per position
+# The tables are generated offline by retrograde analysis, starting from the mates, stalemates and captures and working
+# backwards until no more positions are resolved, and stored in a compressed file that is loaded on the first probe:
+#   python src/endgame_tables.py
+
+default_tables_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame_tables.npz')
+
+# Scores of won positions, from the winning side's point of view. They are kept below the value of a queen, so that
+# promoting the pawn still looks better than the pawn ending it comes from (KQK is not in the tables)
+kpk_win_value = 600
+# plus this much per rank the pawn has advanced, so that the search makes progress
+kpk_rank_value = 10
+# minus the number of plies to mate, so that the search takes the shortest mate
+krk_win_value = 800
+
+# KRK distance to mate of drawn (and impossible) positions
+krk_draw = 255
+
+# Positions are indexed from the point of view of the stronger side (the side with the pawn or the rook), with
+# side 0 = stronger side to move, 1 = lone king to move. Pawns are mirrored to files a-d and ranks are counted from
+# the stronger side, so the pawn is on one of 24 squares. The rook side's king is mirrored to the a1-d1-d4 triangle.
+kpk_size = 2 * 24 * 64 * 64
+krk_triangle = [chess.A1, chess.B1, chess.C1, chess.D1, chess.B2, chess.C2, chess.D2, chess.C3, chess.D3, chess.D4]
+krk_triangle_index = { square: index for index, square in enumerate(krk_triangle) }
+
+def kpk_index(side, strong_king, weak_king, pawn):
+    pawn_index = (chess.square_rank(pawn) - 1) * 4 + chess.square_file(pawn)
+    return ((side * 24 + pawn_index) * 64 + strong_king) * 64 + weak_king
+
+def krk_index(side, strong_king, weak_king, rook):
+    return ((side * 10 + krk_triangle_index[strong_king]) * 64 + weak_king) * 64 + rook
+
+# Mirrors the squares so that the first one is in the a1-d1-d4 triangle
+def krk_canonical(squares):
+    if chess.square_file(squares[0]) > 3:
+        squares = [square ^ 7 for square in squares]
+    if chess.square_rank(squares[0]) > 3:
+        squares = [square ^ 56 for square in squares]
+    if chess.square_rank(squares[0]) > chess.square_file(squares[0]):
+        squares = [chess.square(chess.square_rank(square), chess.square_file(square)) for square in squares]
+
+    return squares
+
+@functools.lru_cache(maxsize=1)
+def load_tables(path = default_tables_path):
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path) as tables:
+        # bytes are faster than numpy arrays to index one item at a time
+        return ( tables['kpk'].tobytes(), tables['krk'].tobytes() )
+
+# The value of a KPK or KRK position for the side to move, or None if the position is not in the tables
+def endgame_table_value(board, path = default_tables_path):
+    if chess.popcount(board.occupied) != 3 or board.castling_rights:
+        return None
+
+    if board.pawns:
+        strong_color = bool(board.pawns & board.occupied_co[chess.WHITE])
+        pieces = board.pawns
+    elif board.rooks:
+        strong_color = bool(board.rooks & board.occupied_co[chess.WHITE])
+        pieces = board.rooks
+    else:
+        return None
+
+    tables = load_tables(path)
+    if tables is None:
+        return None
+
+    side = 0 if board.turn == strong_color else 1
+    squares = [board.king(strong_color), board.king(not strong_color), chess.lsb(pieces)]
+
+    if board.pawns:
+        # seen from the side of the pawn, on files a-d
+        if strong_color == chess.BLACK:
+            squares = [square ^ 56 for square in squares]
+        if chess.square_file(squares[2]) > 3:
+            squares = [square ^ 7 for square in squares]
+
+        index = kpk_index(side, *squares)
+        if not tables[0][index >> 3] >> (7 - (index & 7)) & 1:
+            return 0
+
+        value = kpk_win_value + kpk_rank_value * (chess.square_rank(squares[2]) - 1)
+    else:
+        distance_to_mate = tables[1][krk_index(side, *krk_canonical(squares))]
+        if distance_to_mate == krk_draw:
+            return 0
+
+        value = krk_win_value - distance_to_mate
+
+    return value if side == 0 else -value
+
+# Generation: every position of a table is searched at once, with numpy arrays of the piece squares
+
+squares = np.arange(64)
+distance = np.maximum(abs(squares[:, None] % 8 - squares[None, :] % 8), abs(squares[:, None] // 8 - squares[None, :] // 8))
+directions = [( -1, -1 ), ( -1, 0 ), ( -1, 1 ), ( 0, -1 ), ( 0, 1 ), ( 1, -1 ), ( 1, 0 ), ( 1, 1 )]
+
+def step(square, file_step, rank_step):
+    file, rank = square % 8 + file_step, square // 8 + rank_step
+    return rank * 8 + file if 0 <= file < 8 and 0 <= rank < 8 else -1
+
+# king_targets[square] are the squares a king moves to (-1 off the board), in the order of directions
+king_targets = np.array([[step(square, *direction) for direction in directions] for square in range(64)])
+# white_pawn_attacks[pawn, square]
+white_pawn_attacks = np.array([[square in (step(pawn, -1, 1), step(pawn, 1, 1)) for square in range(64)] for pawn in range(64)])
+# rook_rays[square, direction] are the squares a rook passes, nearest first (-1 off the board)
+rook_rays = np.array([[[step(square, file_step * n, rank_step * n) for n in range(1, 8)] for file_step, rank_step in directions if not file_step or not rank_step] for square in range(64)])
+
+def rook_attacks_with_blocker():
+    # attacks[rook, blocker, square]: whether a rook attacks the square when the only other piece on its lines is the blocker
+    attacks = np.zeros((64, 64, 64), dtype=bool)
+
+    for rook in range(64):
+        for blocker in range(64):
+            for ray in rook_rays[rook]:
+                for square in ray:
+                    if square < 0:
+                        break
+                    attacks[rook, blocker, square] = True
+                    if square == blocker:
+                        break
+
+    return attacks
+
+# Looks up the squares of moves, with a valid mask for moves from off the board
+def targets(table, square):
+    target = table[square]
+    return ( np.maximum(target, 0), target >= 0 )
+
+def generate_kpk():
+    unknown, draw, win = 0, 1, 2
+    index = np.arange(kpk_size)
+    weak_king, strong_king, pawn_index, side = index % 64, index // 64 % 64, index // 4096 % 24, index // (4096 * 24)
+    pawn = (pawn_index // 4 + 1) * 8 + pawn_index % 4
+    promotion = pawn + 8
+    pawn_rank = pawn_index // 4 + 1
+
+    valid = (strong_king != weak_king) & (strong_king != pawn) & (weak_king != pawn) & (distance[strong_king, weak_king] > 1)
+    valid &= (side == 1) | ~white_pawn_attacks[pawn, weak_king]
+
+    result = np.full(kpk_size, unknown, dtype=np.uint8)
+    successors = []
+
+    # the pawn promotes and the queen can't be taken
+    result[valid & (side == 0) & (pawn_rank == 6) & (strong_king != promotion) & (weak_king != promotion) & ((distance[weak_king, promotion] > 1) | (distance[strong_king, promotion] == 1))] = win
+
+    # stronger side: king moves and pawn pushes (promotions are only counted by the rule above)
+    for direction in range(8):
+        target, on_board = targets(king_targets[:, direction], strong_king)
+        legal = on_board & (target != pawn) & (distance[target, weak_king] > 1)
+        successors.append(np.where(valid & (side == 0) & legal, ((24 + pawn_index) * 64 + target) * 64 + weak_king, -1))
+
+    single_push = (pawn_rank < 6) & (promotion != strong_king) & (promotion != weak_king)
+    successors.append(np.where(valid & (side == 0) & single_push, ((24 + pawn_index + 4) * 64 + strong_king) * 64 + weak_king, -1))
+    double_push = single_push & (pawn_rank == 1) & (pawn + 16 != strong_king) & (pawn + 16 != weak_king)
+    successors.append(np.where(valid & (side == 0) & double_push, ((24 + pawn_index + 8) * 64 + strong_king) * 64 + weak_king, -1))
+
+    # lone king: taking the undefended pawn draws, and so does stalemate
+    has_moves = np.zeros(kpk_size, dtype=bool)
+    takes_pawn = np.zeros(kpk_size, dtype=bool)
+    for direction in range(8):
+        target, on_board = targets(king_targets[:, direction], weak_king)
+        legal = valid & (side == 1) & on_board & (distance[target, strong_king] > 1) & ~white_pawn_attacks[pawn, target]
+        has_moves |= legal
+        takes_pawn |= legal & (target == pawn)
+        successors.append(np.where(legal & (target != pawn), (pawn_index * 64 + strong_king) * 64 + target, -1))
+
+    lone_king_to_move = valid & (side == 1)
+    result[lone_king_to_move & (takes_pawn | (~has_moves & ~white_pawn_attacks[pawn, weak_king]))] = draw
+    result[lone_king_to_move & ~has_moves & white_pawn_attacks[pawn, weak_king]] = win
+
+    successors = np.stack(successors, axis=1)
+    exists = successors >= 0
+    strong_to_move = valid & (side == 0)
+
+    # the stronger side wins if any move wins and draws when every move draws, the lone king the other way around
+    while True:
+        successor_results = np.where(exists, result[np.maximum(successors, 0)], draw + win)
+        any_win = (successor_results == win).any(axis=1)
+        any_draw = (successor_results == draw).any(axis=1)
+        any_unknown = (successor_results == unknown).any(axis=1)
+
+        open_positions = valid & (result == unknown)
+        new_result = result.copy()
+        new_result[open_positions & strong_to_move & any_win] = win
+        new_result[open_positions & strong_to_move & ~any_win & ~any_unknown] = draw
+        new_result[open_positions & ~strong_to_move & any_draw] = draw
+        new_result[open_positions & ~strong_to_move & ~any_draw & ~any_unknown] = win
+
+        if (new_result == result).all():
+            break
+        result = new_result
+
+    # positions that are still unknown go round in circles, which is a draw
+    return np.packbits(result == win)
+
+def generate_krk():
+    size = 2 * 64 * 64 * 64
+    index = np.arange(size)
+    rook, weak_king, strong_king, side = index % 64, index // 64 % 64, index // 4096 % 64, index // 262144
+    attacks = rook_attacks_with_blocker()
+    in_check = attacks[rook, strong_king, weak_king]
+
+    valid = (strong_king != weak_king) & (strong_king != rook) & (weak_king != rook) & (distance[strong_king, weak_king] > 1)
+    valid &= (side == 1) | ~in_check
+    strong_to_move = valid & (side == 0)
+    weak_to_move = valid & (side == 1)
+
+    # stronger side: king and rook moves, to positions with the lone king to move
+    strong_successors = []
+    for direction in range(8):
+        target, on_board = targets(king_targets[:, direction], strong_king)
+        legal = strong_to_move & on_board & (target != rook) & (distance[target, weak_king] > 1)
+        strong_successors.append(np.where(legal, ((64 + target) * 64 + weak_king) * 64 + rook, -1).astype(np.int32))
+
+    for ray in range(4):
+        open_ray = strong_to_move.copy()
+        for distance_moved in range(7):
+            target, on_board = targets(rook_rays[:, ray, distance_moved], rook)
+            open_ray &= on_board & (target != strong_king) & (target != weak_king)
+            strong_successors.append(np.where(open_ray, ((64 + strong_king) * 64 + weak_king) * 64 + target, -1).astype(np.int32))
+
+    # lone king: taking the undefended rook draws, and so does stalemate
+    weak_successors = []
+    has_moves = np.zeros(size, dtype=bool)
+    takes_rook = np.zeros(size, dtype=bool)
+    for direction in range(8):
+        target, on_board = targets(king_targets[:, direction], weak_king)
+        legal = weak_to_move & on_board & (distance[target, strong_king] > 1) & ~attacks[rook, strong_king, target]
+        has_moves |= legal
+        takes_rook |= legal & (target == rook)
+        weak_successors.append(np.where(legal & (target != rook), (strong_king * 64 + target) * 64 + rook, -1))
+
+    strong_successors = np.stack(strong_successors, axis=1)
+    weak_successors = np.stack(weak_successors, axis=1)
+    weak_moves = (weak_successors >= 0).sum(axis=1)
+    can_draw = takes_rook | (~has_moves & ~in_check)
+
+    distance_to_mate = np.full(size, -1, dtype=np.int16)
+    distance_to_mate[weak_to_move & ~has_moves & in_check] = 0
+
+    # positions won (lost) in n plies are found from those of n - 1 plies, until neither side finds more
+    plies = 0
+    found = [True, True]
+    while any(found):
+        plies += 1
+        successor_distances = np.where(strong_successors >= 0, distance_to_mate[np.maximum(strong_successors, 0)], -1) if plies % 2 else \
+            np.where(weak_successors >= 0, distance_to_mate[np.maximum(weak_successors, 0)], -1)
+
+        if plies % 2:
+            new = strong_to_move & (distance_to_mate < 0) & (successor_distances == plies - 1).any(axis=1)
+        else:
+            new = weak_to_move & ~can_draw & (distance_to_mate < 0) & ((successor_distances >= 0).sum(axis=1) == weak_moves)
+
+        distance_to_mate[new] = plies
+        found = [found[1], new.any()]
+
+    distance_to_mate[distance_to_mate < 0] = krk_draw
+
+    # only the positions with the stronger king in the a1-d1-d4 triangle are stored
+    return distance_to_mate.astype(np.uint8).reshape(2, 64, 64, 64)[:, krk_triangle]
+
+def generate_tables(path = default_tables_path):
+    tic = time.perf_counter()
+    kpk = generate_kpk()
+    print(f"Generated KPK in {time.perf_counter() - tic:0.1f} seconds: {int(np.unpackbits(kpk).sum())} wins", file = sys.stderr)
+
+    tic = time.perf_counter()
+    krk = generate_krk()
+    print(f"Generated KRK in {time.perf_counter() - tic:0.1f} seconds: longest mate {int(krk[krk != krk_draw].max())} plies", file = sys.stderr)
+
+    np.savez_compressed(path, kpk=kpk, krk=krk)
+    load_tables.cache_clear()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Generate the KPK and KRK endgame tables by retrograde analysis')
+    parser.add_argument('--output', default = default_tables_path, help = f'file to write (default: {default_tables_path})')
+    args = parser.parse_args()
+
+    generate_tables(args.output)
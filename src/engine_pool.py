@@ -0,0 +1,197 @@
+import sys
+import time
+import queue
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import Future
+from board import Board
+from searcher import Searcher
+from move_sorter import MoveHistory
+from search_stats import SearchStats
+from time_manager import allocate_time
+from transposition_table import TranspositionTable, default_size_mb
+
+# Serving mode for the API: a fixed pool of long-lived engine processes, each with its own transposition table and
+# move history, which stay warm across requests. Requests wait in a bounded queue for the next idle worker, and a
+# request for a position that is already queued (or being searched) with the same budget waits for that search instead.
+
+# Depth limit for requests with a time budget only
+max_depth = 64
+# Seconds between checks that the workers are still running, while no result comes in
+worker_poll_interval = 1
+
+# Raised when the queue is full, so that the caller can turn the request away (e.g. with a 503) instead of waiting
+class EnginePoolFull(Exception):
+    pass
+
+# current_jobs[worker_id] is the id of the job being searched (-1 when idle), so that the job of a worker that dies can be failed
+def engine_worker(worker_id, hash_size_mb, collect_stats, jobs, results, current_jobs):
+    transposition_table = TranspositionTable(hash_size_mb)
+    move_history = MoveHistory()
+
+    try:
+        for job_id, fen, depth, movetime in iter(jobs.get, None):
+            current_jobs[worker_id] = job_id
+            try:
+                board = Board(fen)
+                soft_time_limit, hard_time_limit = allocate_time(board.turn, movetime = movetime) if movetime else ( None, None )
+                stats = SearchStats() if collect_stats else None
+                searcher = Searcher(board, depth, transposition_table, soft_time_limit, hard_time_limit, move_history = move_history, stats = stats)
+
+                tic = time.perf_counter()
+                # the searcher's progress lines are logged, and stdout is left to the server
+                with contextlib.redirect_stdout(sys.stderr):
+                    move = searcher.next_move()
+
+                result = {
+                    'move': move.uci(),
+                    'value': searcher.best_move_value,
+                    'depth': searcher.completed_depth,
+                    'nodes': searcher.nodes,
+                    'seconds': round(time.perf_counter() - tic, 4),
+                    'worker': worker_id
+                }
+                results.put(( job_id, result, stats, None ))
+            except Exception as error:
+                results.put(( job_id, None, None, repr(error) ))
+            current_jobs[worker_id] = -1
+    finally:
+        transposition_table.release()
+
+class EnginePool:
+    # workers: number of engine processes
+    # queue_size: number of searches that may wait for a worker, on top of the ones being searched
+    # collect_stats: merge the SearchStats of every search into self.stats
+    def __init__(self, workers = 2, queue_size = 16, hash_size_mb = default_size_mb, collect_stats = False):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.stats = SearchStats() if collect_stats else None
+        self.lock = threading.Lock()
+        # ( fen, depth, movetime ) -> Future of the search, while it is queued or running
+        self.pending = {}
+        self.job_ids = {}
+        self.next_job_id = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+        # workers that died and were started again
+        self.restarted = 0
+        self.hash_size_mb = hash_size_mb
+        self.collect_stats = collect_stats
+        self.closing = False
+
+        self.jobs = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.current_jobs = multiprocessing.Array('q', [-1] * workers, lock = False)
+        self.processes = [self.start_worker(worker_id) for worker_id in range(workers)]
+
+        # hands the results of the workers to the waiting requests (started after the workers are forked)
+        self.dispatcher = threading.Thread(target = self.dispatch, daemon = True)
+        self.dispatcher.start()
+
+    # Queues a search, returning a Future of its result (move, value, depth, nodes, seconds and worker).
+    # Raises ValueError for an invalid position or budget, and EnginePoolFull when the queue is full.
+    def submit(self, fen, depth = None, movetime = None):
+        board = Board(fen)
+
+        if not board.is_valid() or board.is_game_over():
+            raise ValueError(f"No move to search in {fen}")
+        if depth is None and movetime is None:
+            raise ValueError("A search needs a depth or a movetime")
+
+        key = ( board.fen(), depth or max_depth, movetime )
+
+        with self.lock:
+            self.requests += 1
+
+            future = self.pending.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+
+            if len(self.pending) >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise EnginePoolFull(f"{len(self.pending)} searches are queued or running")
+
+            future = Future()
+            job_id = self.next_job_id
+            self.next_job_id += 1
+            self.pending[key] = future
+            self.job_ids[job_id] = key
+
+        self.jobs.put(( job_id, *key ))
+
+        return future
+
+    def search(self, fen, depth = None, movetime = None, timeout = None):
+        return self.submit(fen, depth, movetime).result(timeout)
+
+    def start_worker(self, worker_id):
+        self.current_jobs[worker_id] = -1
+        process = multiprocessing.Process(target = engine_worker, args = (worker_id, self.hash_size_mb, self.collect_stats, self.jobs, self.results, self.current_jobs), daemon = True)
+        process.start()
+
+        return process
+
+    def dispatch(self):
+        while True:
+            self.replace_dead_workers()
+
+            try:
+                message = self.results.get(timeout = worker_poll_interval)
+            except queue.Empty:
+                continue
+
+            if message is None:
+                break
+
+            job_id, result, stats, error = message
+            with self.lock:
+                # the job was already failed when its worker died
+                if job_id not in self.job_ids:
+                    continue
+
+                future = self.pending.pop(self.job_ids.pop(job_id))
+
+                if stats is not None:
+                    self.stats.merge(stats)
+
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(error))
+
+    # A worker that died (e.g. was killed for using too much memory) fails the search it was running, along with the
+    # requests that were waiting for it, and is replaced by a new process, so that the pool keeps its capacity
+    def replace_dead_workers(self):
+        if self.closing:
+            return
+
+        for worker_id, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+
+            job_id = self.current_jobs[worker_id]
+            future = None
+
+            with self.lock:
+                if job_id in self.job_ids:
+                    future = self.pending.pop(self.job_ids.pop(job_id))
+                self.restarted += 1
+
+            if future is not None:
+                future.set_exception(RuntimeError(f"Engine worker {worker_id} exited with code {process.exitcode}"))
+
+            self.processes[worker_id] = self.start_worker(worker_id)
+
+    def shutdown(self):
+        self.closing = True
+
+        for _ in self.processes:
+            self.jobs.put(None)
+        for process in self.processes:
+            process.join()
+
+        self.results.put(None)
+        self.dispatcher.join()
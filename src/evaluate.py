@@ -118,7 +118,32 @@ def get_position_values_for_color(piece, color, is_endgame):
 
 @functools.lru_cache(maxsize=1000)
 def get_position_value(piece, color, square, is_endgame):
-    return get_position_values_for_color(piece, color, is_endgame)[square]
+    return int(get_position_values_for_color(piece, color, is_endgame)[square])
+
+# Material plus position value of a single piece, from white's perspective
+@functools.lru_cache(maxsize=2000)
+def get_piece_square_value(piece, color, square, is_endgame):
+    return (piece_values[piece] + get_position_value(piece, color, square, is_endgame)) * color_multiplier[color]
+
+# Game phase, counted down from max_phase (all pieces on the board) to 0 (kings and pawns only) as pieces come off.
+# The king is scored with a blend of its middlegame and endgame tables, weighted by the phase.
+phase_weights = {
+    chess.PAWN: 0,
+    chess.ROOK: 2,
+    chess.KNIGHT: 1,
+    chess.BISHOP: 1,
+    chess.QUEEN: 4,
+    chess.KING: 0
+}
+max_phase = 24
+
+# What the king on this square gains (from white's perspective) by being scored with the endgame table instead
+def get_king_endgame_adjustment(color, square):
+    return get_piece_square_value(chess.KING, color, square, True) - get_piece_square_value(chess.KING, color, square, False)
+
+# middlegame_value is scored with the middlegame tables; promotions can push the phase above max_phase
+def taper(middlegame_value, king_endgame_adjustment, phase):
+    return middlegame_value + king_endgame_adjustment * (max_phase - min(phase, max_phase)) // max_phase
 
 # Assume the move is being evaluated before it's made
 # How should checks be valued?
@@ -156,3 +181,54 @@ def capture_value(board, move):
     to_piece = board.piece_at(move.to_square).piece_type
 
     return piece_values[to_piece] - piece_values[from_piece]
+
+# Vectorized evaluation of many boards at once.
+# Each board is turned into 12 piece planes (white pawn ... white king, black pawn ... black king) of 64 squares,
+# which are scored with a single dot product against the material + position values of every piece on every square.
+plane_pieces = [(color, piece) for color in [chess.WHITE, chess.BLACK] for piece in chess.PIECE_TYPES]
+
+def get_plane_values(is_endgame):
+    return np.array([
+        [get_piece_square_value(piece, color, square, is_endgame) for square in chess.SQUARES]
+        for color, piece in plane_pieces
+    ], dtype=np.int64).reshape(-1)
+
+middlegame_plane_values = get_plane_values(False)
+king_adjustment_plane_values = get_plane_values(True) - middlegame_plane_values
+plane_phase_weights = np.array([phase_weights[piece] for _, piece in plane_pieces], dtype=np.int64)
+
+def get_piece_bitboards(board):
+    return [board.pieces_mask(piece, color) for color, piece in plane_pieces]
+
+# bitboards: (N, 12) array of piece masks -> (N, 12 * 64) array of 0/1 squares
+def get_piece_planes(bitboards):
+    masks = np.asarray(bitboards, dtype='<u8').reshape(-1, len(plane_pieces))
+    squares = np.unpackbits(masks.view(np.uint8).reshape(len(masks), -1, 8), axis=-1, bitorder='little')
+
+    return squares.reshape(len(masks), -1)
+
+def evaluate_bitboards(bitboards):
+    # the planes of no boards can't be reshaped by square
+    if not len(bitboards):
+        return np.zeros(0, dtype=np.int64)
+
+    planes = get_piece_planes(bitboards)
+    # summed as int64: the default uint64 sum would turn the products with the int64 weights into floats
+    phase = planes.reshape(len(planes), len(plane_pieces), -1).sum(axis=-1, dtype=np.int64) @ plane_phase_weights
+    # numpy floor division rounds the same way as taper()
+    return planes @ middlegame_plane_values + (planes @ king_adjustment_plane_values) * (max_phase - np.minimum(phase, max_phase)) // max_phase
+
+# Same values as Board.value(), for a list of boards
+def batch_evaluate(boards):
+    return evaluate_bitboards([get_piece_bitboards(board) for board in boards])
+
+# Values of the positions reached by each of the moves (e.g. all quiescence candidates of a node), in one call
+def evaluate_moves(board, moves):
+    bitboards = []
+
+    for move in moves:
+        board.push(move)
+        bitboards.append(get_piece_bitboards(board))
+        board.pop()
+
+    return evaluate_bitboards(bitboards)
@@ -0,0 +1,136 @@
+import sys
+import json
+import time
+import queue
+import argparse
+import multiprocessing
+from board import Board
+from searcher import Searcher
+from transposition_table import TranspositionTable
+
+# https://www.chessprogramming.org/Lazy_SMP
+# Every worker searches the same root position; they only cooperate through the shared transposition table.
+# Helpers vary their depth and root move order (see Searcher), so their table entries speed up the main search.
+
+# The table is shared through multiprocessing.shared_memory, which is new in python 3.8
+lazy_smp_supported = sys.version_info >= (3, 8)
+# Seconds between checks that the helpers are still running, while waiting for their results
+helper_poll_interval = 1
+
+def search_worker(worker_id, board, depth, table_name, table_size_mb, soft_time_limit, hard_time_limit, stop_event, results):
+    transposition_table = TranspositionTable.attach_shared(table_name, table_size_mb)
+    searcher = Searcher(board, depth, transposition_table, soft_time_limit, hard_time_limit, worker_id, stop_event)
+
+    try:
+        move = searcher.next_move()
+        results.put(( worker_id, searcher.completed_depth, move.uci(), searcher.best_move_value, searcher.nodes ))
+    finally:
+        transposition_table.release()
+
+# The next result sent by a helper, or None when all of them have exited without sending one (e.g. one was killed)
+def helper_result(results, helpers):
+    while True:
+        helpers_alive = any(helper.is_alive() for helper in helpers)
+
+        try:
+            return results.get(timeout = helper_poll_interval)
+        except queue.Empty:
+            # the results of helpers that had already exited would have been received
+            if not helpers_alive:
+                return None
+
+class LazySMPSearcher():
+    # stats (SearchStats), tracer (SearchTracer), stop_event and uci_info only apply to the main search (which stops
+    # the helpers when it finishes)
+    def __init__(self, board, depth, transposition_table, soft_time_limit = None, hard_time_limit = None, workers = 2, move_history = None, stats = None, tracer = None, stop_event = None):
+        self.board = board
+        self.depth = depth
+        self.transposition_table = transposition_table
+        self.soft_time_limit = soft_time_limit
+        self.hard_time_limit = hard_time_limit
+        self.workers = workers
+        self.uci_info = False
+        self.nodes = 0
+        self.completed_depth = 0
+        self.best_move_value = None
+        self.principal_variation = []
+        self.searcher = Searcher(board, depth, transposition_table, soft_time_limit, hard_time_limit, stop_event = stop_event, move_history = move_history, stats = stats, tracer = tracer)
+
+    # see Searcher.start_clock; helpers run until the main search stops them, so they need no limits
+    def start_clock(self, soft_time_limit, hard_time_limit):
+        self.searcher.start_clock(soft_time_limit, hard_time_limit)
+
+    # The main process is worker 0; once it finishes, the helpers are stopped and the deepest completed result wins
+    def next_move(self):
+        table_name = self.transposition_table.share()
+        stop_event = multiprocessing.Event()
+        results = multiprocessing.Queue()
+
+        helpers = [
+            multiprocessing.Process(
+                target = search_worker,
+                args = (worker_id, self.board.copy(), self.depth, table_name, self.transposition_table.size_mb, self.soft_time_limit, self.hard_time_limit, stop_event, results),
+                daemon = True
+            )
+            for worker_id in range(1, self.workers)
+        ]
+
+        for helper in helpers:
+            helper.start()
+
+        searcher = self.searcher
+        searcher.uci_info = self.uci_info
+        move = searcher.next_move()
+        stop_event.set()
+
+        best = ( searcher.completed_depth, 0, move, searcher.best_move_value )
+        self.nodes = searcher.nodes
+
+        for _ in helpers:
+            result = helper_result(results, helpers)
+            if result is None:
+                break
+
+            worker_id, completed_depth, uci, value, nodes = result
+            self.nodes += nodes
+
+            # prefer deeper results; on equal depth, the main search wins
+            if completed_depth > best[0]:
+                best = ( completed_depth, worker_id, self.board.parse_uci(uci), value )
+
+        for helper in helpers:
+            helper.join()
+
+        self.completed_depth, worker_id, move, self.best_move_value = best
+        self.principal_variation = searcher.principal_variation if worker_id == 0 else [move.uci()]
+
+        return move
+
+# Scaling benchmark: time-to-depth and nodes per second for an increasing number of workers
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--depth', type = int, default = 3)
+    parser.add_argument('--workers', type = int, nargs = '+', default = [1, 2, 4, 8])
+    parser.add_argument('--fen', default = '1r3rk1/p1p3pp/3bp3/1p1P1q2/P3pP2/2B1P2P/1P4Q1/4K1NR b K - 0 1')
+    args = parser.parse_args()
+
+    report = []
+    for workers in args.workers:
+        transposition_table = TranspositionTable()
+        searcher = LazySMPSearcher(Board(args.fen), args.depth, transposition_table, workers = workers)
+
+        tic = time.perf_counter()
+        move = searcher.next_move()
+        elapsed = time.perf_counter() - tic
+        transposition_table.release()
+
+        report.append({
+            'workers': workers,
+            'depth': searcher.completed_depth,
+            'move': move.uci(),
+            'time_to_depth': round(elapsed, 4),
+            'nodes': searcher.nodes,
+            'nps': round(searcher.nodes / elapsed)
+        })
+
+    print(json.dumps(report, indent = 4), file = sys.stderr)
@@ -0,0 +1,96 @@
+import json
+import time
+import argparse
+import urllib.error
+import urllib.request
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from bench import next_move_positions, standard_positions
+from engine_pool import EnginePool, EnginePoolFull
+
+# Local load generator for the /next_move API (or an in-process EnginePool), reporting throughput and latency as JSON:
+#   python src/load_test.py --url http://localhost:5000 --requests 200 --concurrency 8 --depth 2
+#   python src/load_test.py --in-process --workers 4 --requests 200 --concurrency 8 --depth 2
+# Requests cycle through the positions, so with more concurrent requests than positions some of them are coalesced.
+
+positions = standard_positions + next_move_positions
+
+def http_search(url, fen, depth, movetime):
+    body = { 'fen': fen }
+    if depth is not None:
+        body['depth'] = depth
+    if movetime is not None:
+        body['movetime'] = movetime
+
+    request = urllib.request.Request(url + '/next_move', data = json.dumps(body).encode(), headers = { 'Content-Type': 'application/json' })
+
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+def pool_search(pool, fen, depth, movetime):
+    try:
+        pool.search(fen, depth, movetime)
+        return 200
+    except EnginePoolFull:
+        return 503
+
+def run_load(search, requests, concurrency, depth = None, movetime = None):
+    def timed_search(index):
+        tic = time.perf_counter()
+        status = search(positions[index % len(positions)], depth, movetime)
+        return ( status, time.perf_counter() - tic )
+
+    tic = time.perf_counter()
+    with ThreadPoolExecutor(max_workers = concurrency) as executor:
+        results = list(executor.map(timed_search, range(requests)))
+    elapsed = time.perf_counter() - tic
+
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    # latencies of the answered requests only, rejections are fast and would flatter the percentiles
+    latencies = np.array([seconds for status, seconds in results if status == 200]) * 1000
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'depth': depth,
+        'movetime': movetime,
+        'seconds': round(elapsed, 4),
+        'throughput': round(statuses.get('200', 0) / elapsed, 2),
+        'statuses': statuses,
+        'latency_ms': {
+            name: round(float(np.percentile(latencies, percentile)), 1) if len(latencies) else None
+            for name, percentile in [('p50', 50), ('p90', 90), ('p99', 99), ('max', 100)]
+        }
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Send concurrent /next_move requests and report throughput and latency percentiles as JSON')
+    parser.add_argument('--url', default = 'http://localhost:5000', help = 'API to load (default: http://localhost:5000)')
+    parser.add_argument('--in-process', action = 'store_true', help = 'load an EnginePool in this process instead of the API')
+    parser.add_argument('--workers', type = int, default = 2, help = 'engine processes of the in-process pool (default: 2)')
+    parser.add_argument('--queue-size', type = int, default = 16, help = 'queue size of the in-process pool (default: 16)')
+    parser.add_argument('--requests', type = int, default = 100, help = 'number of requests (default: 100)')
+    parser.add_argument('--concurrency', type = int, default = 4, help = 'requests in flight at a time (default: 4)')
+    parser.add_argument('--depth', type = int, help = 'search depth of each request')
+    parser.add_argument('--movetime', type = int, help = 'search time of each request, in milliseconds')
+    args = parser.parse_args()
+
+    if args.depth is None and args.movetime is None:
+        args.depth = 2
+
+    if args.in_process:
+        pool = EnginePool(args.workers, args.queue_size)
+        report = run_load(lambda *search: pool_search(pool, *search), args.requests, args.concurrency, args.depth, args.movetime)
+        report['pool'] = { 'workers': args.workers, 'queue_size': args.queue_size, 'coalesced': pool.coalesced, 'rejected': pool.rejected, 'restarted': pool.restarted }
+        pool.shutdown()
+    else:
+        report = run_load(lambda *search: http_search(args.url, *search), args.requests, args.concurrency, args.depth, args.movetime)
+
+    print(json.dumps(report, indent = 4))
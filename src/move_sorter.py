@@ -1,10 +1,34 @@
 import chess
 from collections import defaultdict
 from evaluate import evaluate_move_value, piece_values
+from static_exchange import static_exchange_evaluation
+from search_stats import timed
+
+promotion_squares = chess.BB_RANK_1 | chess.BB_RANK_8
 
 def sort_moves_by_value(board, moves):
     return sorted(moves, key=lambda move: evaluate_move_value(board, move), reverse=True)
 
+# Killer moves first (most recent slot first), then by how often the move caused a cutoff, then by static value
+def sort_quiet_moves(board, moves, move_history, ply):
+    if move_history is None:
+        return sort_moves_by_value(board, moves)
+
+    killers = move_history.killers_at(ply)
+    history = move_history.history
+
+    def priority(move):
+        if move == killers[0]:
+            killer_rank = 2
+        elif move == killers[1]:
+            killer_rank = 1
+        else:
+            killer_rank = 0
+
+        return ( killer_rank, history[move.from_square][move.to_square], evaluate_move_value(board, move) )
+
+    return sorted(moves, key=priority, reverse=True)
+
 def determine_victim_and_aggressor_types(board, move):
     if board.is_en_passant(move):
         return [move, piece_values[chess.PAWN], piece_values[chess.PAWN]]
@@ -20,29 +44,100 @@ def sort_mvv_lva(board, moves):
     # move is index 0, victim values are index 1, aggressor values are index 2
     return list(map(lambda x: x[0], sorted(victims_and_aggressors, key=lambda x: (-x[1], x[2]))))
 
-def prioritize_legal_moves(board):
+def prioritize_legal_moves(board, hash_move = None, move_history = None, ply = 0):
     legal_moves = board.legal_moves
 
     grouped_moves = groupby(legal_moves, compose_move_type(board))
     sorted_check_moves = sort_moves_by_value(board, grouped_moves['check'])
     sorted_capture_moves = sort_mvv_lva(board, grouped_moves['capture'])
-    sorted_quiet_moves = sort_moves_by_value(board, grouped_moves['quiet'])
+    sorted_quiet_moves = sort_quiet_moves(board, grouped_moves['quiet'], move_history, ply)
 
     # nonquiet moves should be searched first, since they are most likely to increase value
-    return sorted_check_moves + sorted_capture_moves + sorted_quiet_moves
+    moves = sorted_check_moves + sorted_capture_moves + sorted_quiet_moves
+
+    # ...unless a previous search already found the best move
+    if hash_move in moves:
+        moves.remove(hash_move)
+        moves.insert(0, hash_move)
 
-def get_moves_to_dequiet(board):
+    return moves
+
+# Staged move picker: each stage is only generated when the previous ones did not produce a cutoff.
+# Stages: hash move, captures and promotions (MVV-LVA), killer moves, remaining quiet moves (history, then static value)
+# stats (SearchStats), when given, is charged with the time spent generating and ordering the moves
+def pick_moves(board, hash_move = None, move_history = None, ply = 0, stats = None):
+    if hash_move is not None and board.is_legal(hash_move):
+        yield hash_move
+
+    tactical_moves = timed(stats, 'move_generation', list, generate_tactical_moves(board))
+    for move in timed(stats, 'move_ordering', sort_tactical_moves, board, tactical_moves):
+        if move != hash_move:
+            yield move
+
+    killers = list(move_history.killers_at(ply)) if move_history is not None else []
+    for killer in killers:
+        if killer is not None and killer != hash_move and board.is_legal(killer) and not board.is_capture(killer) and not killer.promotion:
+            yield killer
+
+    quiet_moves = timed(stats, 'move_generation', list, (move for move in generate_quiet_moves(board) if move != hash_move and move not in killers))
+    yield from timed(stats, 'move_ordering', sort_quiet_moves, board, quiet_moves, move_history, ply)
+
+# Quiescence search only considers moves that can change the material balance (or checks), unless in check
+def get_moves_to_dequiet(board, stats = None):
     if board.is_check():
-        return prioritize_legal_moves(board)
+        yield from pick_moves(board, stats = stats)
+        return
 
-    legal_moves = board.legal_moves
-    
-    grouped_moves = groupby(legal_moves, compose_move_type(board))
+    tactical_moves = timed(stats, 'move_generation', list, generate_tactical_moves(board))
+    yield from timed(stats, 'move_ordering', sort_by_exchange, board, tactical_moves)
 
-    sorted_check_moves = sort_moves_by_value(board, grouped_moves['check'])
-    sorted_capture_moves = sort_mvv_lva(board, grouped_moves['capture'])
+    # gives_check is expensive, so checks are only generated when none of the captures caused a cutoff
+    check_moves = timed(stats, 'move_generation', list, (move for move in generate_quiet_moves(board) if board.gives_check(move)))
+    yield from timed(stats, 'move_ordering', sort_moves_by_value, board, check_moves)
+
+# Captures (including en passant) and promotions
+def generate_tactical_moves(board):
+    yield from board.generate_legal_captures()
+    yield from board.generate_legal_moves(board.pawns, promotion_squares & ~board.occupied)
+
+def generate_quiet_moves(board):
+    for move in board.generate_legal_moves(chess.BB_ALL, ~board.occupied):
+        if not move.promotion and not board.is_en_passant(move):
+            yield move
+
+    # castling moves go to the (occupied) rook square internally, so the destination mask above leaves them out
+    yield from board.generate_castling_moves()
+
+# MVV-LVA, where a promotion counts as capturing the difference between the new piece and the pawn
+def sort_tactical_moves(board, moves):
+    def priority(move):
+        victim = board.piece_type_at(move.to_square)
+        value = piece_values[victim] if victim else 0
+
+        if move.promotion:
+            value += piece_values[move.promotion] - piece_values[chess.PAWN]
+        elif board.is_en_passant(move):
+            value = piece_values[chess.PAWN]
 
-    return sorted_check_moves + sorted_capture_moves
+        return ( value, -piece_values[board.piece_type_at(move.from_square)] )
+
+    return sorted(moves, key=priority, reverse=True)
+
+# Captures and promotions that do not lose material (https://www.chessprogramming.org/Static_Exchange_Evaluation),
+# best exchange first, then MVV-LVA
+def sort_by_exchange(board, moves):
+    scored_moves = []
+
+    for move in moves:
+        exchange_value = static_exchange_evaluation(board, move)
+
+        if exchange_value >= 0:
+            victim = board.piece_type_at(move.to_square)
+            scored_moves.append(( exchange_value, piece_values[victim] if victim else 0, -piece_values[board.piece_type_at(move.from_square)], move ))
+
+    scored_moves.sort(key=lambda scored_move: scored_move[:3], reverse=True)
+
+    return [scored_move[3] for scored_move in scored_moves]
 
 # input list to split, function to group by
 def groupby(list_to_group, fn):
@@ -64,3 +159,39 @@ def compose_move_type(board):
             return 'quiet'
 
     return determine_move_type
+
+# Killer moves (https://www.chessprogramming.org/Killer_Heuristic) and the history heuristic
+# (https://www.chessprogramming.org/History_Heuristic): quiet moves that caused a beta cutoff are likely to cause
+# one again, either in a sibling position at the same ply (killers) or anywhere in the tree (history).
+# The tables are kept between searches, and aged at the start of each one.
+class MoveHistory:
+    def __init__(self, max_ply = 128):
+        self.killers = [[None, None] for _ in range(max_ply)]
+        self.history = [[0] * 64 for _ in range(64)]
+
+    def killers_at(self, ply):
+        if ply < len(self.killers):
+            return self.killers[ply]
+
+        return [None, None]
+
+    def store_cutoff(self, move, depth, ply):
+        if ply < len(self.killers):
+            killers = self.killers[ply]
+
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+        # deeper cutoffs save more work, so they weigh more
+        self.history[move.from_square][move.to_square] += depth * depth
+
+    # Killers are specific to the previous position, so they are dropped; history scores are halved
+    def age(self):
+        for killers in self.killers:
+            killers[0] = None
+            killers[1] = None
+
+        for scores in self.history:
+            for to_square in range(64):
+                scores[to_square] >>= 1
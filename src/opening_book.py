@@ -0,0 +1,57 @@
+import random
+import chess
+import chess.polyglot
+
+# Polyglot opening books (https://www.chessprogramming.org/PolyGlot): the .bin file is memory-mapped by
+# chess.polyglot, and its entries are sorted by zobrist key, so a probe is a binary search over the mapped file.
+# The board's incrementally maintained zobrist key is the polyglot key, so probing does not rehash the position.
+
+default_max_book_ply = 20
+book_selections = ['weighted', 'best']
+
+class OpeningBook:
+    # selection: 'weighted' picks a move at random in proportion to the entry weights, 'best' the highest weighted one
+    # max_ply: the book is not probed once this many plies have been played (counted from the start of the game)
+    def __init__(self, path, selection = 'weighted', max_ply = default_max_book_ply, seed = None):
+        self.path = path
+        self.selection = selection
+        self.max_ply = max_ply
+        self.random = random.Random(seed)
+        self.reader = chess.polyglot.open_reader(path)
+
+    def close(self):
+        self.reader.close()
+
+    # Legal book moves with their weights
+    def moves(self, board):
+        moves = []
+
+        for entry in self.reader.find_all(board.zobrist):
+            try:
+                # polyglot encodes castling as the king taking its own rook, find_move turns that into e1g1 etc.
+                moves.append(( board.find_move(entry.move.from_square, entry.move.to_square, entry.move.promotion), entry.weight ))
+            except chess.IllegalMoveError:
+                # a key collision
+                continue
+
+        return moves
+
+    # Returns None when the position is not in the book (or is past max_ply)
+    def probe(self, board):
+        if board.ply() >= self.max_ply:
+            return None
+
+        moves = self.moves(board)
+        total_weight = sum(weight for _, weight in moves)
+
+        if not total_weight:
+            return None
+
+        if self.selection == 'best':
+            return max(moves, key=lambda move: move[1])[0]
+
+        choice = self.random.randrange(total_weight)
+        for move, weight in moves:
+            choice -= weight
+            if choice < 0:
+                return move
@@ -1,25 +1,133 @@
+import sys
+import json
 import time
+import argparse
 from board import Board
-from move_sorter import get_moves_to_dequiet, prioritize_legal_moves
+from move_sorter import prioritize_legal_moves, pick_moves
 
-def perft(depth, board):
+# Perft (https://www.chessprogramming.org/Perft): counts the leaf nodes of the full move tree to a given depth, which
+# checks move generation (and the incremental board state kept by push/pop) against known counts, and times it.
+#   python src/perft.py --depth 4 --mode raw ordered
+#   python src/perft.py --position kiwipete --depth 3 --divide
+
+# https://www.chessprogramming.org/Perft_Results -- node counts for depths 1, 2, 3, ...
+perft_positions = [
+    {
+        'name': 'startpos',
+        'fen': 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+        'nodes': [20, 400, 8902, 197281, 4865609]
+    },
+    {
+        'name': 'kiwipete',
+        'fen': 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+        'nodes': [48, 2039, 97862, 4085603]
+    },
+    # endgame: en passant and discovered checks along the rank
+    {
+        'name': 'position3',
+        'fen': '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+        'nodes': [14, 191, 2812, 43238, 674624]
+    },
+    # promotions (with and without capture) and castling rights
+    {
+        'name': 'position4',
+        'fen': 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+        'nodes': [6, 264, 9467, 422333]
+    },
+    {
+        'name': 'position5',
+        'fen': 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+        'nodes': [44, 1486, 62379, 2103487]
+    }
+]
+
+# raw: legal move generation only; ordered: the full sorted move list (root and fallback ordering);
+# staged: the lazy move picker used by the search
+move_generators = {
+    'raw': lambda board: board.legal_moves,
+    'ordered': prioritize_legal_moves,
+    'staged': pick_moves
+}
+
+# The last ply is only counted (bulk counting), so the move generator is timed on the plies above it
+def perft(depth, board, generate_moves = move_generators['raw']):
     if depth == 1:
         return board.legal_moves.count()
     elif depth > 1:
         count = 0
 
-        for move in prioritize_legal_moves(board):
+        for move in generate_moves(board):
             board.push(move)
-            count += perft(depth - 1, board)
+            count += perft(depth - 1, board, generate_moves)
             board.pop()
 
         return count
     else:
         return 1
 
-if __name__ == '__main__':
+# Leaf node count below each root move, for finding which move a wrong total comes from
+def divide(depth, board, generate_moves = move_generators['raw']):
+    counts = {}
+
+    for move in generate_moves(board):
+        board.push(move)
+        counts[move.uci()] = perft(depth - 1, board, generate_moves)
+        board.pop()
+
+    return counts
+
+def expected_nodes(position, depth):
+    if 0 < depth <= len(position['nodes']):
+        return position['nodes'][depth - 1]
+
+    return None
+
+def run_perft(position, depth, mode):
+    board = Board(position['fen'])
+
     tic = time.perf_counter()
-    board = Board()
-    nodes = perft(5, board)
-    toc = time.perf_counter()
-    print(f"Searched {nodes} moves in {toc - tic:0.4f} seconds")
+    nodes = perft(depth, board, move_generators[mode])
+    elapsed = time.perf_counter() - tic
+    expected = expected_nodes(position, depth)
+
+    return {
+        'position': position['name'],
+        'fen': position['fen'],
+        'depth': depth,
+        'mode': mode,
+        'nodes': nodes,
+        'expected_nodes': expected,
+        'correct': expected is None or nodes == expected,
+        'seconds': round(elapsed, 4),
+        'nodes_per_second': round(nodes / elapsed) if elapsed > 0 else None
+    }
+
+def run_suite(depth, modes, positions = perft_positions):
+    return [run_perft(position, depth, mode) for position in positions for mode in modes]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Count and time the leaf nodes of the move tree of the standard perft positions, as JSON')
+    parser.add_argument('--depth', type = int, default = 3, help = 'perft depth (default: 3)')
+    parser.add_argument('--mode', nargs = '+', choices = list(move_generators), default = list(move_generators), help = 'move generation to time (default: all)')
+    parser.add_argument('--position', nargs = '+', choices = [position['name'] for position in perft_positions], help = 'positions to run (default: all)')
+    parser.add_argument('--fen', help = 'run a custom position instead (there is no known node count to check against)')
+    parser.add_argument('--divide', action = 'store_true', help = 'also report the node count below each root move')
+    args = parser.parse_args()
+
+    if args.fen:
+        positions = [{ 'name': 'custom', 'fen': args.fen, 'nodes': [] }]
+    else:
+        positions = [position for position in perft_positions if not args.position or position['name'] in args.position]
+
+    results = run_suite(args.depth, args.mode, positions)
+
+    if args.divide:
+        for result in results:
+            result['divide'] = divide(args.depth, Board(result['fen']), move_generators[result['mode']])
+
+    print(json.dumps(results, indent = 4))
+
+    # a wrong node count is a move generation bug, so fail (e.g. in CI)
+    if not all(result['correct'] for result in results):
+        print('Node counts do not match: ' + ', '.join(f"{result['position']} ({result['mode']})" for result in results if not result['correct']), file = sys.stderr)
+        sys.exit(1)
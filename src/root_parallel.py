@@ -0,0 +1,83 @@
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from searcher import Searcher
+from transposition_table import TranspositionTable
+from move_sorter import prioritize_legal_moves
+
+# Root splitting: the legal moves at the root are searched in parallel by a pool of processes.
+# The first (most promising) move is searched on its own to establish an alpha bound, then the rest are
+# distributed across the pool. Workers read the best value found so far from shared memory before they start.
+
+# Per-process state of the pool workers, set up by initialize_worker
+worker_state = {}
+
+def initialize_worker(shared_alpha, table_name, table_size_mb):
+    worker_state['alpha'] = shared_alpha
+    worker_state['transposition_table'] = TranspositionTable.attach_shared(table_name, table_size_mb)
+
+def search_root_move(board, uci, depth):
+    shared_alpha = worker_state['alpha']
+    # search with a bound one below the best value so far, so that a move which ties it still gets an exact value
+    bound = shared_alpha.value - 1
+
+    searcher = Searcher(board, depth, worker_state['transposition_table'])
+    board.push(board.parse_uci(uci))
+    _, value = searcher.negamax(board, depth - 1, -99999, -bound)
+    value = -value
+
+    with shared_alpha.get_lock():
+        shared_alpha.value = max(shared_alpha.value, value)
+
+    return ( uci, value, bound, searcher.nodes )
+
+class RootParallelPool():
+    def __init__(self, transposition_table, workers):
+        self.transposition_table = transposition_table
+        self.alpha = multiprocessing.Value('i', -99999)
+        # only one search can use the shared alpha bound at a time
+        self.lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(
+            max_workers = workers,
+            initializer = initialize_worker,
+            initargs = (self.alpha, transposition_table.share(), transposition_table.size_mb)
+        )
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+class RootParallelSearcher():
+    def __init__(self, board, depth, pool):
+        self.board = board
+        self.depth = depth
+        self.pool = pool
+        self.nodes = 0
+        self.best_move_value = None
+
+    def next_move(self):
+        tic = time.perf_counter()
+        hash_move = self.pool.transposition_table.get_best_move(self.board.zobrist)
+        moves = [move.uci() for move in prioritize_legal_moves(self.board, hash_move)]
+
+        with self.pool.lock:
+            self.pool.alpha.value = -99999 - 1
+
+            first = self.pool.executor.submit(search_root_move, self.board.copy(), moves[0], self.depth)
+            results = [first.result()]
+            rest = [self.pool.executor.submit(search_root_move, self.board.copy(), uci, self.depth) for uci in moves[1:]]
+            results += [future.result() for future in rest]
+
+        # Merge deterministically: only values above the bound a move was searched with are exact. Ties go to
+        # the move that was ordered first, just like in the sequential search.
+        best_move = None
+        for uci, value, bound, nodes in results:
+            self.nodes += nodes
+
+            if value > bound and (best_move is None or value > self.best_move_value):
+                best_move, self.best_move_value = uci, value
+
+        toc = time.perf_counter()
+        print(f"Searched {self.nodes} moves, and found best move {best_move} with value: {self.best_move_value} in {toc - tic:0.4f} seconds")
+
+        return self.board.parse_uci(best_move)
@@ -0,0 +1,134 @@
+import time
+
+# Parts of the search that are timed
+timed_phases = ['move_generation', 'move_ordering', 'evaluation']
+
+# Counters collected by a Searcher when it is given a SearchStats (searches without one skip all of the bookkeeping)
+class SearchStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.searches = 0
+        self.search_time = 0.0
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.beta_cutoffs = 0
+        # beta cutoffs caused by the first move searched, a measure of move ordering quality
+        self.first_move_cutoffs = 0
+        # moves searched again with the full window after a null window search found them better (principal variation
+        # search), and iterations searched again after failing outside of their aspiration window
+        self.re_searches = 0
+        self.aspiration_re_searches = 0
+        # nodes given up after a null move search, moves searched at a reduced depth, and quiescence captures not searched
+        self.null_move_cutoffs = 0
+        self.late_move_reductions = 0
+        self.delta_pruned_moves = 0
+        self.times = { phase: 0.0 for phase in timed_phases }
+        # ( depth, seconds since the start of the search, total nodes ) of each completed iteration
+        self.iterations = []
+
+    # Adds the counters of another search, e.g. to keep totals across the searches of a server
+    def merge(self, other):
+        for counter in ['searches', 'search_time', 'nodes', 'quiescence_nodes', 'tt_probes', 'tt_hits', 'tt_cutoffs', 'beta_cutoffs', 'first_move_cutoffs', 're_searches', 'aspiration_re_searches', 'null_move_cutoffs', 'late_move_reductions', 'delta_pruned_moves']:
+            setattr(self, counter, getattr(self, counter) + getattr(other, counter))
+
+        for phase in timed_phases:
+            self.times[phase] += other.times[phase]
+
+    def total_nodes(self):
+        return self.nodes + self.quiescence_nodes
+
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0
+
+    def tt_cutoff_rate(self):
+        return self.tt_cutoffs / self.tt_probes if self.tt_probes else 0
+
+    def quiescence_share(self):
+        total = self.total_nodes()
+        return self.quiescence_nodes / total if total else 0
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0
+
+    # How many times more nodes the last iteration searched than the one before it
+    def effective_branching_factor(self):
+        if len(self.iterations) < 2:
+            return None
+
+        nodes = [0] + [iteration_nodes for _, _, iteration_nodes in self.iterations]
+        last, previous = nodes[-1] - nodes[-2], nodes[-2] - nodes[-3]
+
+        return last / previous if previous else None
+
+    def json(self):
+        effective_branching_factor = self.effective_branching_factor()
+
+        return {
+            'nodes': self.total_nodes(),
+            'main_nodes': self.nodes,
+            'quiescence_nodes': self.quiescence_nodes,
+            'quiescence_share': round(self.quiescence_share(), 4),
+            'tt_probes': self.tt_probes,
+            'tt_hit_rate': round(self.tt_hit_rate(), 4),
+            'tt_cutoff_rate': round(self.tt_cutoff_rate(), 4),
+            'beta_cutoffs': self.beta_cutoffs,
+            'first_move_cutoff_rate': round(self.first_move_cutoff_rate(), 4),
+            're_searches': self.re_searches,
+            'aspiration_re_searches': self.aspiration_re_searches,
+            'null_move_cutoffs': self.null_move_cutoffs,
+            'late_move_reductions': self.late_move_reductions,
+            'delta_pruned_moves': self.delta_pruned_moves,
+            'seconds_in': { phase: round(seconds, 4) for phase, seconds in self.times.items() },
+            'effective_branching_factor': round(effective_branching_factor, 2) if effective_branching_factor else None,
+            'time_to_depth': [{ 'depth': depth, 'seconds': round(seconds, 4), 'nodes': nodes } for depth, seconds, nodes in self.iterations]
+        }
+
+    # e.g. "info string qnodes 1200 ttprobes 1300 tthits 20 ttcutoffs 15 betacutoffs 80 firstmovecutoffs 70 researches 5 aspirationresearches 1 nullmovecutoffs 4 lmr 30 deltapruned 12"
+    def uci_info(self):
+        return (
+            f"info string qnodes {self.quiescence_nodes} ttprobes {self.tt_probes} tthits {self.tt_hits} ttcutoffs {self.tt_cutoffs} "
+            f"betacutoffs {self.beta_cutoffs} firstmovecutoffs {self.first_move_cutoffs} researches {self.re_searches} aspirationresearches {self.aspiration_re_searches} "
+            f"nullmovecutoffs {self.null_move_cutoffs} lmr {self.late_move_reductions} deltapruned {self.delta_pruned_moves}"
+        )
+
+    # Totals in the Prometheus text format (https://prometheus.io/docs/instrumenting/exposition_formats/)
+    def prometheus(self, prefix = 'chess_ai'):
+        metrics = [
+            ('searches_total', 'Completed searches', [('', self.searches)]),
+            ('search_seconds_total', 'Time spent searching', [('', self.search_time)]),
+            ('nodes_total', 'Searched nodes', [('{type="main"}', self.nodes), ('{type="quiescence"}', self.quiescence_nodes)]),
+            ('tt_probes_total', 'Transposition table probes', [('', self.tt_probes)]),
+            ('tt_hits_total', 'Transposition table probes that found a usable entry', [('', self.tt_hits)]),
+            ('tt_cutoffs_total', 'Transposition table probes that ended the search of the node', [('', self.tt_cutoffs)]),
+            ('beta_cutoffs_total', 'Beta cutoffs', [('', self.beta_cutoffs)]),
+            ('first_move_beta_cutoffs_total', 'Beta cutoffs caused by the first move searched', [('', self.first_move_cutoffs)]),
+            ('re_searches_total', 'Moves searched again with the full window', [('{type="move"}', self.re_searches), ('{type="aspiration"}', self.aspiration_re_searches)]),
+            ('null_move_cutoffs_total', 'Nodes given up after a null move search failed high', [('', self.null_move_cutoffs)]),
+            ('late_move_reductions_total', 'Moves searched at a reduced depth', [('', self.late_move_reductions)]),
+            ('delta_pruned_moves_total', 'Quiescence captures and promotions not searched', [('', self.delta_pruned_moves)]),
+            ('phase_seconds_total', 'Time spent in parts of the search', [(f'{{phase="{phase}"}}', seconds) for phase, seconds in self.times.items()])
+        ]
+
+        lines = []
+        for name, description, samples in metrics:
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines += [f"{prefix}_{name}{labels} {value}" for labels, value in samples]
+
+        return '\n'.join(lines) + '\n'
+
+# Calls function(*args), adding the time it took to stats.times[phase] when stats (SearchStats) is given
+def timed(stats, phase, function, *args):
+    if stats is None:
+        return function(*args)
+
+    tic = time.perf_counter()
+    result = function(*args)
+    stats.times[phase] += time.perf_counter() - tic
+
+    return result
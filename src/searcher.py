@@ -1,54 +1,133 @@
 import math
 import time
-import json
+import random
 import chess
-import chess.polyglot
-from evaluate import color_multiplier
+from evaluate import color_multiplier, piece_values
 from transposition_table import HashEntry, Flag
-from decorators import call_counter, generate_move_tree
-from move_sorter import get_moves_to_dequiet, prioritize_legal_moves
-from json_encoder import JSONEncoder
+from search_stats import timed
+from endgame_tables import endgame_table_value
+from move_sorter import get_moves_to_dequiet, pick_moves, prioritize_legal_moves, MoveHistory
 
-def handle_search_complete(pline, transposition_table, kwargs):
-    print(f"Principal Variation: {pline}")
+# Principal variation search: after the first move of a node, the moves are searched with a null window, which only
+# tells whether they are better than the best move so far, and re-searched with the full window when they are
+use_principal_variation_search = True
+# Each iteration (after the first) starts with a window of this many centipawns either side of the score of the
+# previous one, and is searched again with the full window on the side it fails on (None: always the full window)
+aspiration_window = 50
+# Null move pruning (https://www.chessprogramming.org/Null_Move_Pruning): a position where the side to move is still
+# above beta after passing its turn (searched this many plies shallower) is assumed to fail high. In zugzwang passing
+# would be better than any move, so positions where the side to move has only pawns (and its king) are not pruned.
+use_null_move_pruning = True
+null_move_reduction = 2
+# Late move reductions (https://www.chessprogramming.org/Late_Move_Reductions): quiet moves (other than killers) that
+# come after this many moves in the move order are searched a ply shallower with a null window first, and only at full
+# depth when they beat alpha. Moves that give check, moves out of check and nodes shallower than
+# late_move_reduction_depth are not reduced.
+use_late_move_reductions = True
+late_move_reduction_moves = 4
+late_move_reduction_depth = 3
+# Delta pruning in the quiescence search (https://www.chessprogramming.org/Delta_Pruning): captures and promotions
+# that leave the side to move this many centipawns short of alpha, even with the material they win, are not searched
+use_delta_pruning = True
+delta_margin = 200
 
-    nodes = kwargs.get("nodes")
-    with open('tree.json', 'w') as f:
-        f.write(json.dumps(nodes, indent=4, cls=JSONEncoder))
-
-    table = getattr(transposition_table, 'table')
-    json_table = list(map(lambda x: x.json(), filter(lambda entry: entry is not None, table)))
-    with open('transposition_table.json', 'w') as f:
-        f.write(json.dumps(json_table, indent=4, cls=JSONEncoder))
+# Raised inside the search tree when the hard time limit has been reached, or the search was asked to stop
+class SearchAborted(Exception):
+    pass
 
 # TODO: Future enhancement... rotate the board so that the bot can play vs itself
 class Searcher():
-    def __init__(self, board, depth, transposition_table):
+    # worker_id > 0 marks a helper of a parallel search, which varies its depth and root move order
+    # stop_event (threading.Event or multiprocessing.Event) aborts the search once it is set
+    # move_history (killer and history tables) should be passed in to carry it over between searches
+    # stats (SearchStats) collects node, transposition table and timing counters, when given
+    # tracer (SearchTracer) writes the searched nodes to a file, when given
+    # opening_book (OpeningBook) is probed before searching, when given
+    def __init__(self, board, depth, transposition_table, soft_time_limit = None, hard_time_limit = None, worker_id = 0, stop_event = None, move_history = None, stats = None, tracer = None, opening_book = None):
         self.board = board
         self.depth = depth
         self.transposition_table = transposition_table
+        self.move_history = move_history if move_history is not None else MoveHistory()
+        self.soft_time_limit = soft_time_limit
+        self.hard_time_limit = hard_time_limit
+        self.worker_id = worker_id
+        self.stop_event = stop_event
+        self.stats = stats
+        self.opening_book = opening_book
+        self.random = random.Random(worker_id)
+        self.deadline = None
+        # the time limits count from here, set when the search starts (or by start_clock)
+        self.clock_start = None
+        self.nodes = 0
+        self.completed_depth = 0
+        self.best_move_value = None
+        self.root_ply = len(board.move_stack)
+        # print UCI info lines (depth, nodes, nps, hashfull, pv) after each iteration
+        self.uci_info = False
+        self.principal_variation = []
+        self.principal_variation_search = use_principal_variation_search
+        self.aspiration_window = aspiration_window
+        self.null_move_pruning = use_null_move_pruning
+        self.late_move_reductions = use_late_move_reductions
+        self.delta_pruning = use_delta_pruning
+
+        # only traced searches pay for tracing: the wrapper replaces negamax on this instance
+        if tracer is not None:
+            self.negamax = tracer.trace(self, self.negamax)
+
+    def should_stop(self):
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+
+        return self.deadline is not None and time.perf_counter() > self.deadline
 
     # https://en.wikipedia.org/wiki/Negamax#Negamax_with_alpha_beta_pruning_and_transposition_tables
     # only need to return best move at the top of the tree
-    @call_counter
-    @generate_move_tree
-    def negamax(self, board, depth, alpha, beta, pline = [], **kwargs):
-        line = []
+    def negamax(self, board, depth, alpha, beta, pline = []):
         best_move = None
 
+        self.nodes += 1
+        # only check the clock every 128 nodes
+        if self.nodes & 127 == 0 and self.should_stop():
+            raise SearchAborted()
+
+        stats = self.stats
+        if stats is not None:
+            if depth > 0:
+                stats.nodes += 1
+            else:
+                stats.quiescence_nodes += 1
+
         if board.is_checkmate():
             return ( best_move, -99999 )
-        # can_claim_draw() is slow, due to 3-fold repetition check... limiting it to non-quiescence search to improve perf
-        elif depth > 0 and (board.is_stalemate() or board.can_claim_draw()):
+        # repetitions are found from the board's key stack, so they are cheap to check at every node (except the root, which needs a move)
+        elif len(board.move_stack) > self.root_ply and board.is_repetition_or_fifty_moves():
+            return ( best_move, 0 )
+        # stalemate needs the legal moves to be generated, so it is left to the non-quiescence search
+        elif depth > 0 and board.is_stalemate():
             return ( best_move, 0 )
 
+        # KPK and KRK positions are scored exactly from the endgame tables (the root still needs a move, so it is searched)
+        if len(board.move_stack) > self.root_ply:
+            table_value = endgame_table_value(board)
+            if table_value is not None:
+                return ( best_move, table_value )
+
         alpha_orig = alpha
 
-        zobrist = chess.polyglot.zobrist_hash(board)
+        zobrist = board.zobrist
         stored_entry = self.transposition_table.get(zobrist, depth)
 
+        if stats is not None:
+            stats.tt_probes += 1
+
         if stored_entry is not None and stored_entry.depth <= depth:
+            if stats is not None:
+                stats.tt_hits += 1
+
             if stored_entry.flag == Flag.EXACT:
+                if stats is not None:
+                    stats.tt_cutoffs += 1
                 return ( stored_entry.best_move, stored_entry.value )
             elif stored_entry.flag == Flag.LOWER_BOUND:
                 alpha = max(alpha, stored_entry.value)
@@ -56,12 +135,20 @@ class Searcher():
                 beta = min(beta, stored_entry.value)
 
             if alpha >= beta:
+                if stats is not None:
+                    stats.tt_cutoffs += 1
                 return ( stored_entry.best_move, stored_entry.value )
 
+        in_check = board.is_check()
+        ply = len(board.move_stack) - self.root_ply
+
         if depth <= 0:
             color = board.turn
-            stand_pat = board.value() * color_multiplier[color]
-            if not board.is_check():
+            if stats is None:
+                stand_pat = board.value() * color_multiplier[color]
+            else:
+                stand_pat = timed(stats, 'evaluation', board.value) * color_multiplier[color]
+            if not in_check:
                 if stand_pat >= beta:
                     return ( best_move, beta )
                 alpha = max(alpha, stand_pat)
@@ -69,21 +156,82 @@ class Searcher():
             if depth < -5:
                 return ( best_move, stand_pat )
 
-            moves = get_moves_to_dequiet(board)
-
-            if not moves:
-                return ( best_move, stand_pat )
+            moves = get_moves_to_dequiet(board, stats)
         else:
-            moves = prioritize_legal_moves(board)
+            # pass (unless the opponent just passed): if the opponent, moving twice in a row, still cannot get below beta, cut off
+            if (self.null_move_pruning and depth >= 2 and ply > 0 and not in_check and beta < 99999 and board.move_stack[-1]
+                    and board.occupied_co[board.turn] & ~(board.pawns | board.kings)
+                    and board.value() * color_multiplier[board.turn] >= beta):
+                board.push(chess.Move.null())
+                null_move_value = -self.negamax(board, depth - 1 - null_move_reduction, -beta, -beta + 1, [])[1]
+                board.pop()
 
+                if null_move_value >= beta:
+                    if stats is not None:
+                        stats.null_move_cutoffs += 1
+                    return ( best_move, beta )
+
+            # search the best move from a previous (shallower) search first
+            moves = pick_moves(board, self.transposition_table.get_best_move(zobrist), self.move_history, ply, stats)
+
+            # helpers of a parallel search shuffle the root moves (after the first one), so they explore different subtrees first
+            if self.worker_id and len(board.move_stack) == self.root_ply:
+                moves = list(moves)
+                moves = moves[:1] + self.random.sample(moves[1:], len(moves) - 1)
+
+        # moves are generated lazily, so whether there are any is only known after the loop
+        moves_searched = 0
         max_val = -99999
         for move in moves:
+            if depth <= 0 and self.delta_pruning and not in_check and self.is_futile_capture(board, move, stand_pat, alpha):
+                if stats is not None:
+                    stats.delta_pruned_moves += 1
+                continue
+
+            moves_searched += 1
+            # a child that returns early (e.g. from the table) leaves its line empty, rather than that of its sibling
+            line = []
+            late_quiet_move = (
+                self.late_move_reductions and depth >= late_move_reduction_depth and not in_check
+                and moves_searched > late_move_reduction_moves and not board.is_capture(move) and not move.promotion
+                and move not in self.move_history.killers_at(ply)
+            )
             board.push(move)
-            result = self.negamax(board, depth - 1, -beta, -alpha, line, **kwargs)
-            move_eval = -result[1]
+
+            full_depth = True
+            if late_quiet_move and not board.is_check():
+                if stats is not None:
+                    stats.late_move_reductions += 1
+                move_eval = -self.negamax(board, depth - 2, -alpha - 1, -alpha, line)[1]
+
+                # the reduced search can't tell how much better than the best move so far it is
+                full_depth = move_eval > alpha
+                if full_depth:
+                    if stats is not None:
+                        stats.re_searches += 1
+                    line = []
+
+            if full_depth and depth > 0 and moves_searched > 1 and self.principal_variation_search:
+                result = self.negamax(board, depth - 1, -alpha - 1, -alpha, line)
+                move_eval = -result[1]
+
+                # better than the best move so far, so its exact value is needed
+                if alpha < move_eval < beta:
+                    if stats is not None:
+                        stats.re_searches += 1
+                    line = []
+                    result = self.negamax(board, depth - 1, -beta, -alpha, line)
+                    move_eval = -result[1]
+            elif full_depth:
+                result = self.negamax(board, depth - 1, -beta, -alpha, line)
+                move_eval = -result[1]
+
             board.pop()
 
             if depth <= 0 and move_eval >= beta:
+                if stats is not None:
+                    stats.beta_cutoffs += 1
+                    stats.first_move_cutoffs += moves_searched == 1
                 return ( best_move, beta )
 
             if move_eval > max_val:
@@ -94,8 +242,18 @@ class Searcher():
             alpha = max(alpha, max_val)
 
             if alpha >= beta:
+                if stats is not None:
+                    stats.beta_cutoffs += 1
+                    stats.first_move_cutoffs += moves_searched == 1
+
+                # remember quiet moves that refute the position, to order them early in similar positions
+                if depth > 0 and not board.is_capture(move) and not move.promotion:
+                    self.move_history.store_cutoff(move, depth, ply)
                 break
 
+        if not moves_searched:
+            return ( best_move, stand_pat )
+
         flag_to_store = None
         if max_val <= alpha_orig:
             flag_to_store = Flag.UPPER_BOUND
@@ -103,32 +261,139 @@ class Searcher():
             flag_to_store = Flag.LOWER_BOUND
         else:
             flag_to_store = Flag.EXACT
-        
-        # TODO: store principal variation in transposition_table
+
         new_entry = HashEntry(zobrist, best_move, depth, max_val, flag_to_store, board.halfmove_clock)
         self.transposition_table.replace(new_entry)
 
-        if depth == self.depth:
-            handle_search_complete(pline, self.transposition_table, kwargs)
-
         return ( best_move, max_val )
 
+    # A capture or promotion that can't raise the value of a quiescence node to alpha, even without losing the piece
+    # that made it. Checks are always searched, as they may be mate.
+    def is_futile_capture(self, board, move, stand_pat, alpha):
+        if move.promotion:
+            gain = piece_values[move.promotion] - piece_values[chess.PAWN]
+        elif board.is_en_passant(move):
+            gain = piece_values[chess.PAWN]
+        elif board.is_capture(move):
+            gain = 0
+        else:
+            return False
+
+        victim = board.piece_type_at(move.to_square)
+        if victim:
+            gain += piece_values[victim]
+
+        # gives_check is expensive, so it is only asked of the moves that would be pruned
+        return stand_pat + gain + delta_margin <= alpha and not board.gives_check(move)
+
+    # Iterative deepening: search to depth 1, 2, ... until the max depth or the time limit is reached.
+    # Each iteration stores its best moves in the transposition table, which orders the moves of the next one.
     def next_move(self):
+        if self.opening_book is not None:
+            book_move = self.opening_book.probe(self.board)
+
+            if book_move is not None:
+                print(f"Found book move {book_move}")
+                return book_move
+
         best_move = None
-        alpha = -99999
-        beta = 99999
 
         prioritized_moves = prioritize_legal_moves(self.board)
+        self.move_history.age()
 
         tic = time.perf_counter()
+        if self.clock_start is None:
+            self.clock_start = tic
+        # odd helpers of a parallel search skip the first iteration, and go one ply deeper than the main search
+        start_depth = 1 + self.worker_id % 2
+
+        for depth in range(start_depth, self.depth + start_depth):
+            try:
+                pline = []
+                move, value = self.search_root(depth, pline)
+            except SearchAborted:
+                # unwind the moves that were pushed by the aborted iteration
+                while len(self.board.move_stack) > self.root_ply:
+                    self.board.pop()
+                break
+
+            self.completed_depth = depth
+            self.best_move_value = value
+            # later nodes of the iteration may have replaced the entries of the principal variation. The line stops at
+            # nodes that were answered from the table, where it is continued with the best moves stored in the table.
+            self.transposition_table.store_principal_variation(self.board, pline)
+            self.principal_variation = [pv_move.uci() for pv_move in self.transposition_table.get_principal_variation(self.board)]
+            if self.stats is not None:
+                self.stats.iterations.append(( depth, time.perf_counter() - tic, self.nodes ))
+            if self.uci_info:
+                self.print_uci_info(time.perf_counter() - tic)
+            # when every move loses, keep the move from the previous iteration
+            if move is not None:
+                best_move = move
+
+            # a forced mate was found, searching deeper will not change the outcome
+            if abs(value) >= 99999:
+                break
 
-        best_move, best_move_value = self.negamax(self.board, self.depth, alpha, beta)
+            elapsed = time.perf_counter() - self.clock_start
+            # the next iteration will take longer than all of the previous ones combined, so don't start it unless there is time
+            if self.soft_time_limit is not None and elapsed >= self.soft_time_limit / 2:
+                break
+
+            # the first iteration always completes, so that there is a move to play
+            if self.hard_time_limit is not None:
+                self.deadline = self.clock_start + self.hard_time_limit
 
         # handle case where checkmate is impending... we still need to move
         if best_move is None:
             best_move = prioritized_moves[0]
 
         toc = time.perf_counter()
-        print(f"Searched {self.negamax.calls} moves, and found best move {best_move} with value: {best_move_value} in {toc - tic:0.4f} seconds")
+        if self.stats is not None:
+            self.stats.searches += 1
+            self.stats.search_time += toc - tic
+
+        print(f"Searched {self.nodes} moves to depth {self.completed_depth}, and found best move {best_move} with value: {self.best_move_value} in {toc - tic:0.4f} seconds")
 
         return best_move
+
+    # One iteration, searched with an aspiration window around the score of the previous one. A score outside of the
+    # window is only a bound, so the iteration is searched again with the window opened on that side.
+    def search_root(self, depth, pline):
+        alpha, beta = -99999, 99999
+
+        if self.aspiration_window is not None and self.best_move_value is not None and abs(self.best_move_value) < 99999:
+            alpha = self.best_move_value - self.aspiration_window
+            beta = self.best_move_value + self.aspiration_window
+
+        while True:
+            move, value = self.negamax(self.board, depth, alpha, beta, pline)
+
+            if value <= alpha and alpha > -99999:
+                alpha = -99999
+            elif value >= beta and beta < 99999:
+                beta = 99999
+            else:
+                return ( move, value )
+
+            if self.stats is not None:
+                self.stats.aspiration_re_searches += 1
+
+    # Restarts the clock of a running search with new time limits, e.g. when the opponent plays the move a ponder
+    # search (which has no limits) was started for. Called from another thread than the search.
+    def start_clock(self, soft_time_limit, hard_time_limit):
+        self.soft_time_limit = soft_time_limit
+        self.hard_time_limit = hard_time_limit
+        self.clock_start = time.perf_counter()
+
+        if self.completed_depth and hard_time_limit is not None:
+            self.deadline = self.clock_start + hard_time_limit
+
+    def print_uci_info(self, elapsed):
+        nps = int(self.nodes / elapsed) if elapsed > 0 else 0
+        pv = ' '.join(self.principal_variation)
+
+        print(f"info depth {self.completed_depth} score cp {self.best_move_value} nodes {self.nodes} nps {nps} hashfull {self.transposition_table.hashfull()} time {int(elapsed * 1000)} pv {pv}", flush = True)
+
+        if self.stats is not None:
+            print(self.stats.uci_info(), flush = True)
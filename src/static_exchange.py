@@ -0,0 +1,78 @@
+import chess
+from evaluate import piece_values
+
+# Static Exchange Evaluation: https://www.chessprogramming.org/Static_Exchange_Evaluation
+# The material won (or lost, if negative) by the side to move when both sides keep recapturing on the destination
+# square of a move with their least valuable attacker, each stopping as soon as recapturing would lose material.
+
+exchange_order = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING]
+
+# Pieces of both colors attacking the square, when only the pieces in occupied are on the board.
+# Removing a piece from occupied uncovers the sliders behind it (x-rays).
+def attackers_mask(board, square, occupied):
+    queens_and_rooks = board.queens | board.rooks
+    queens_and_bishops = board.queens | board.bishops
+
+    attackers = (
+        (chess.BB_KING_ATTACKS[square] & board.kings) |
+        (chess.BB_KNIGHT_ATTACKS[square] & board.knights) |
+        (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] & queens_and_rooks) |
+        (chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied] & queens_and_rooks) |
+        (chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & queens_and_bishops) |
+        (chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK]) |
+        (chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE])
+    )
+
+    return attackers & occupied
+
+def least_valuable_attacker(board, attackers, color):
+    for piece_type in exchange_order:
+        candidates = attackers & board.pieces_mask(piece_type, color)
+
+        if candidates:
+            return ( piece_type, chess.lsb(candidates) )
+
+    return ( None, None )
+
+# Move must be legal in the current position; quiet moves and promotions are scored by whether the piece can be won on its new square
+def static_exchange_evaluation(board, move):
+    to_square = move.to_square
+    occupied = board.occupied ^ chess.BB_SQUARES[move.from_square]
+
+    if board.is_en_passant(move):
+        gain = piece_values[chess.PAWN]
+        occupied ^= chess.BB_SQUARES[to_square - 8 if board.turn == chess.WHITE else to_square + 8]
+    else:
+        victim = board.piece_type_at(to_square)
+        gain = piece_values[victim] if victim else 0
+
+    if move.promotion:
+        gain += piece_values[move.promotion] - piece_values[chess.PAWN]
+
+    # gains[i] is the material won by the side making the i-th capture, if the exchange stops after it
+    gains = [gain]
+    piece_on_square = move.promotion or board.piece_type_at(move.from_square)
+    color = not board.turn
+
+    while True:
+        attackers = attackers_mask(board, to_square, occupied)
+        piece_type, square = least_valuable_attacker(board, attackers & board.occupied_co[color], color)
+
+        if piece_type is None:
+            break
+
+        # the king can only recapture when the square is no longer defended
+        if piece_type == chess.KING and attackers & board.occupied_co[not color]:
+            break
+
+        gains.append(piece_values[piece_on_square] - gains[-1])
+        piece_on_square = piece_type
+        occupied ^= chess.BB_SQUARES[square]
+        color = not color
+
+    # either side can decline to recapture, so work back from the end of the exchange
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+
+    return gains[0]
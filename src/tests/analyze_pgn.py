@@ -0,0 +1,59 @@
+import sys
+sys.path.insert(0, 'src')
+import io
+import os
+import json
+import unittest
+import tempfile
+from unittest import mock
+import analyze_pgn
+from analyze_pgn import read_games, analyze_game, analyze
+from transposition_table import TranspositionTable
+
+pgn = '''[Event "Test"]
+[White "white"]
+[Black "black"]
+
+1. e4 e5 2. Qh5 Nc6 *
+'''
+
+class AnalyzePgnTest(unittest.TestCase):
+
+    def test_annotates_every_move(self):
+        with tempfile.NamedTemporaryFile('w', suffix = '.pgn') as f:
+            f.write(pgn)
+            f.flush()
+            games = list(read_games([f.name]))
+
+        self.assertEqual(len(games), 1)
+
+        records = list(analyze_game(games[0], 1, TranspositionTable(1), None, None))
+
+        self.assertEqual([record['played'] for record in records], ['e2e4', 'e7e5', 'd1h5', 'b8c6'])
+        self.assertEqual([record['ply'] for record in records], [0, 1, 2, 3])
+        self.assertEqual(records[3]['fen'], 'rnbqkbnr/pppp1ppp/8/4p2Q/4P3/8/PPPP1PPP/RNB1KBNR b KQkq - 1 2')
+
+    def analyze(self, games):
+        output = io.StringIO()
+
+        with tempfile.NamedTemporaryFile('w', suffix = '.pgn') as f:
+            f.write(pgn * games)
+            f.flush()
+            with mock.patch.object(analyze_pgn, 'worker_poll_interval', 0.1):
+                analyze([f.name], output, 1, 2, 1)
+
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_failed_game_gets_an_error_record(self):
+        with mock.patch.object(analyze_pgn.Searcher, 'next_move', side_effect = RuntimeError('search failed')):
+            records = self.analyze(3)
+
+        self.assertEqual(sorted(record['game'] for record in records), [0, 1, 2])
+        self.assertTrue(all('search failed' in record['error'] for record in records))
+
+    def test_killed_workers_do_not_block_the_pipeline(self):
+        with mock.patch.object(analyze_pgn, 'analysis_worker', lambda *args: os._exit(1)):
+            self.assertEqual(self.analyze(20), [])
+
+if __name__ == '__main__':
+    unittest.main()
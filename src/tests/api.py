@@ -0,0 +1,90 @@
+import os
+import sys
+sys.path.insert(0, 'src')
+import time
+import unittest
+import contextlib
+import chess
+os.environ['HASH_SIZE_MB'] = '1'
+import api
+from board import Board
+
+dont_sacrifice_rook = '2r3k1/6p1/5p1p/p2r4/3p4/6B1/PPP2PPP/R3R1K1 w - - 0 1'
+
+class ApiTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = api.app.test_client()
+
+    def next_move(self, body):
+        # the searcher prints its progress
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            return self.client.post('/next_move', json = body)
+
+    def test_next_move(self):
+        response = self.next_move({ 'fen': dont_sacrifice_rook, 'depth': 2 })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.get_json()['move'], 'e1e8')
+
+    def test_evaluate_needs_a_list_of_fens(self):
+        for body in [{}, { 'fens': [] }, { 'fens': chess.STARTING_FEN }, { 'fens': [1] }]:
+            self.assertEqual(self.client.post('/evaluate', json = body).status_code, 400)
+
+    def test_next_move_with_a_time_budget(self):
+        tic = time.perf_counter()
+        response = self.next_move({ 'fen': dont_sacrifice_rook, 'movetime': 200 })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.perf_counter() - tic, 2)
+
+    def test_positions_without_a_move_are_rejected(self):
+        fools_mate = 'rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3'
+        stalemate = '7k/5Q2/6K1/8/8/8/8/8 b - - 0 1'
+
+        for fen in [fools_mate, stalemate]:
+            self.assertEqual(self.next_move({ 'fen': fen }).status_code, 400)
+
+    def test_movetime_is_rejected_with_root_parallelism(self):
+        root_parallel_workers = api.root_parallel_workers
+        api.root_parallel_workers = 2
+        try:
+            response = self.next_move({ 'fen': dont_sacrifice_rook, 'movetime': 200 })
+        finally:
+            api.root_parallel_workers = root_parallel_workers
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_table_size_is_not_set_by_requests(self):
+        response = self.next_move({ 'fen': dont_sacrifice_rook, 'depth': 1, 'hash': 'abc' })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(api.transposition_table.size_mb, 1)
+
+    def test_evaluate(self):
+        fens = [chess.STARTING_FEN, '4k3/8/8/8/8/8/8/3QK3 w - - 0 1']
+        response = self.client.post('/evaluate', json = { 'fens': fens })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['values'], [Board(fen).value() for fen in fens])
+        self.assertTrue(all(isinstance(value, int) for value in response.get_json()['values']))
+
+    def test_evaluate_rejects_an_invalid_fen(self):
+        response = self.client.post('/evaluate', json = { 'fens': [chess.STARTING_FEN, 'not a fen'] })
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_transposition_table_rejects_invalid_pages(self):
+        for query in ['cursor=-1', 'limit=0', 'limit=-5']:
+            response = self.client.get(f'/transposition_table?{query}')
+
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_transposition_table_pages(self):
+        response = self.client.get('/transposition_table?cursor=0&limit=1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Next-Cursor', response.headers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,134 @@ import sys
 sys.path.insert(0, 'src')
 import unittest
 import chess
+import chess.polyglot
 from board import Board
 
 class BoardTest(unittest.TestCase):
 
+    def tearDown(self):
+        Board.debug = False
+
     def test_board_value(self):
         board = Board('5k2/8/4p3/4Np2/3P4/7r/P3p3/6K1 b - - 0 1')
-        self.assertEqual(board.value(), -290)
+        self.assertEqual(board.value(), -287)
+
+    def test_value_matches_evaluation_after_capture_and_promotion(self):
+        board = Board('5k2/8/4p3/4Np2/3P4/7r/P3p3/6K1 b - - 0 1')
+        board.push(chess.Move.from_uci('h3h1'))
+        board.push(chess.Move.from_uci('g1h1'))
+        board.push(chess.Move.from_uci('e2e1q'))
+        self.assertEqual(board.value(), board.evaluate())
+
+    def test_value_matches_evaluation_after_castling_and_en_passant(self):
+        board = Board('r3k2r/pppppppp/8/4P3/8/8/PPPP1PPP/R3K2R b KQkq - 0 1')
+        for uci in ['d7d5', 'e5d6', 'e8c8', 'e1g1']:
+            board.push(chess.Move.from_uci(uci))
+            self.assertEqual(board.value(), board.evaluate())
+
+    def test_value_is_restored_on_pop(self):
+        board = Board()
+        initial_value = board.value()
+        for uci in ['e2e4', 'd7d5', 'e4d5', 'd8d5']:
+            board.push(chess.Move.from_uci(uci))
+        for _ in range(4):
+            board.pop()
+        self.assertEqual(board.value(), initial_value)
+
+    def test_value_is_recomputed_when_position_is_set(self):
+        board = Board()
+        board.push(chess.Move.from_uci('e2e4'))
+        board.set_fen('5k2/8/4p3/4Np2/3P4/7r/P3p3/6K1 b - - 0 1')
+        self.assertEqual(board.value(), -287)
+
+    def test_phase_is_updated_on_capture_and_restored_on_pop(self):
+        board = Board('r3k3/8/8/8/8/8/8/R3K1Q1 w - - 0 1')
+        self.assertEqual(board.phase, 8)
+        self.assertTrue(board.is_endgame)
+        board.push(chess.Move.from_uci('a1a8'))
+        self.assertEqual(board.phase, 6)
+        board.pop()
+        self.assertEqual(board.phase, 8)
+
+    def test_phase_counts_promoted_pieces(self):
+        board = Board('8/4P3/8/8/8/8/8/k3K3 w - - 0 1')
+        board.push(chess.Move.from_uci('e7e8q'))
+        self.assertEqual(board.phase, 4)
+
+    def test_endgame_is_live_after_set_fen_and_push(self):
+        board = Board()
+        self.assertFalse(board.is_endgame)
+        board.set_fen('3qk3/8/8/8/8/8/8/2BQKN2 b - - 0 1')
+        self.assertFalse(board.is_endgame)
+        board.push(chess.Move.from_uci('d8d1'))
+        self.assertTrue(board.is_endgame)
+
+    # no queen, or a queen with at most one minor piece, for both sides
+    def test_endgame_rule(self):
+        self.assertTrue(Board('r1b1kbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNB1KB1R w KQkq - 0 1').is_endgame)
+        self.assertTrue(Board('3qk3/8/8/8/8/8/8/3QKR2 w - - 0 1').is_endgame)
+        self.assertFalse(Board('r1bqk2r/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNB1KB1R w KQkq - 0 1').is_endgame)
+
+    def test_repetitions_are_counted_from_the_key_stack(self):
+        board = Board()
+        for _ in range(2):
+            for uci in ['g1f3', 'g8f6', 'f3g1', 'f6g8']:
+                board.push(chess.Move.from_uci(uci))
+                self.assertEqual(board.repetitions() + 1 >= 3, board.is_repetition(3))
+        self.assertEqual(board.repetitions(), 2)
+        self.assertTrue(board.is_repetition_or_fifty_moves())
+        board.pop()
+        self.assertEqual(board.repetitions(), 1)
+        self.assertFalse(board.is_repetition_or_fifty_moves())
+
+    def test_repetitions_stop_at_irreversible_moves(self):
+        board = Board()
+        for uci in ['g1f3', 'g8f6', 'f3g1', 'f6g8', 'e2e4', 'e7e5', 'g1f3', 'g8f6', 'f3g1', 'f6g8']:
+            board.push(chess.Move.from_uci(uci))
+        self.assertEqual(board.repetitions(), 1)
+
+    def test_fifty_move_rule_uses_halfmove_clock(self):
+        board = Board('8/8/4k3/8/8/4K3/8/7R w - - 99 80')
+        self.assertFalse(board.is_repetition_or_fifty_moves())
+        board.push(chess.Move.from_uci('h1h2'))
+        self.assertTrue(board.is_repetition_or_fifty_moves())
+
+    def test_zobrist_matches_polyglot_hash(self):
+        board = Board('r3k2r/pppppppp/8/4P3/8/8/PPPP1PPP/R3K2R b KQkq - 0 1')
+        for uci in ['d7d5', 'e5d6', 'e8c8', 'e1g1', 'c7d6']:
+            board.push(chess.Move.from_uci(uci))
+            self.assertEqual(board.zobrist, chess.polyglot.zobrist_hash(board))
+        for _ in range(5):
+            board.pop()
+        self.assertEqual(board.zobrist, chess.polyglot.zobrist_hash(board))
+
+    def test_root_and_mirror_recompute_the_running_state(self):
+        board = Board('r3k2r/pppppppp/8/4P3/8/8/PPPP1PPP/R3K2R b KQkq - 0 1')
+        for uci in ['d7d5', 'e5d6', 'e8c8']:
+            board.push(chess.Move.from_uci(uci))
+
+        for derived in [board.root(), board.mirror(), board.transform(chess.flip_horizontal)]:
+            fresh = Board(derived.fen())
+            self.assertEqual(
+                ( derived.score, derived.king_adjustment, derived.phase, derived.zobrist, derived.pawn_zobrist ),
+                ( fresh.score, fresh.king_adjustment, fresh.phase, fresh.zobrist, fresh.pawn_zobrist )
+            )
+            self.assertEqual(derived.zobrist, chess.polyglot.zobrist_hash(derived))
+
+    def test_pawn_zobrist_only_changes_with_pawn_moves(self):
+        board = Board()
+        pawn_zobrist = board.pawn_zobrist
+        board.push(chess.Move.from_uci('g1f3'))
+        self.assertEqual(board.pawn_zobrist, pawn_zobrist)
+        board.push(chess.Move.from_uci('e7e5'))
+        self.assertNotEqual(board.pawn_zobrist, pawn_zobrist)
+
+    def test_debug_mode_detects_inconsistent_value(self):
+        Board.debug = True
+        board = Board()
+        board.score += 1
+        with self.assertRaises(AssertionError):
+            board.push(chess.Move.from_uci('e2e4'))
 
 if __name__ == '__main__':
     unittest.main()
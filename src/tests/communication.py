@@ -0,0 +1,99 @@
+import sys
+sys.path.insert(0, 'src')
+import io
+import time
+import unittest
+import contextlib
+import communication
+from board import Board
+from communication import command
+from transposition_table import TranspositionTable
+
+class CommunicationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.board = Board()
+        self.transposition_table = TranspositionTable(1)
+        self.output = io.StringIO()
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(self.output):
+            communication.stop_search()
+
+    def send(self, msg):
+        with contextlib.redirect_stdout(self.output):
+            command(self.board, 3, self.transposition_table, msg)
+
+    def wait_for_search(self):
+        with contextlib.redirect_stdout(self.output):
+            communication.search_thread.thread.join(10)
+
+    def bestmoves(self):
+        return [line for line in self.output.getvalue().splitlines() if line.startswith('bestmove')]
+
+    def test_isready_is_answered_while_searching(self):
+        self.send('go infinite')
+        self.send('isready')
+
+        self.assertIn('readyok', self.output.getvalue())
+        self.assertEqual(self.bestmoves(), [])
+
+        self.send('stop')
+
+        self.assertEqual(len(self.bestmoves()), 1)
+        self.assertIn(self.board.parse_uci(self.bestmoves()[0].split(' ')[1]), self.board.legal_moves)
+
+    def test_ponder_search_waits_for_ponderhit(self):
+        self.send('go ponder movetime 200')
+        time.sleep(0.3)
+
+        self.assertEqual(self.bestmoves(), [])
+
+        self.send('ponderhit')
+        self.wait_for_search()
+
+        self.assertEqual(len(self.bestmoves()), 1)
+
+    def test_finished_ponder_search_waits_for_stop(self):
+        self.send('position fen r5rk/5p1p/5R2/4B3/8/8/7P/7K w - - 0 1')
+        self.send('go ponder')
+        time.sleep(0.3)
+
+        self.assertEqual(self.bestmoves(), [])
+
+        self.send('stop')
+
+        self.assertTrue(self.bestmoves()[0].startswith('bestmove f6a6'))
+
+    def test_bestmove_has_the_expected_reply(self):
+        self.send('position fen r5rk/5p1p/5R2/4B3/8/8/7P/7K w - - 0 1')
+        self.send('go depth 3')
+        self.wait_for_search()
+
+        _, move, _, reply = self.bestmoves()[0].split(' ')
+        self.board.push_uci(move)
+
+        self.assertEqual(move, 'f6a6')
+        self.assertIn(self.board.parse_uci(reply), self.board.legal_moves)
+
+    def test_failed_search_still_sends_bestmove(self):
+        self.send('position fen rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3')
+        self.send('go depth 2')
+        self.wait_for_search()
+
+        self.assertIn('info string search failed', self.output.getvalue())
+        self.assertEqual(self.bestmoves(), ['bestmove 0000'])
+
+    def test_threads_need_shared_memory(self):
+        lazy_smp_supported = communication.lazy_smp_supported
+        communication.lazy_smp_supported = False
+        try:
+            self.send('setoption name Threads value 4')
+        finally:
+            communication.lazy_smp_supported = lazy_smp_supported
+
+        self.assertEqual(communication.options['Threads'], 1)
+        self.assertIn('needs python 3.8+', self.output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import sys
+sys.path.insert(0, 'src')
+import unittest
+from board import Board
+from searcher import Searcher
+from transposition_table import TranspositionTable
+from endgame_tables import endgame_table_value, kpk_win_value, kpk_rank_value, krk_win_value
+
+class EndgameTablesTest(unittest.TestCase):
+
+    # king in front of the pawn on the 6th rank wins, whoever is to move
+    def test_king_and_pawn_win(self):
+        self.assertEqual(endgame_table_value(Board('4k3/8/4K3/4P3/8/8/8/8 w - - 0 1')), kpk_win_value + 3 * kpk_rank_value)
+        self.assertEqual(endgame_table_value(Board('4k3/8/4K3/4P3/8/8/8/8 b - - 0 1')), -(kpk_win_value + 3 * kpk_rank_value))
+
+    def test_king_and_pawn_opposition(self):
+        self.assertEqual(endgame_table_value(Board('8/3k4/8/3K4/3P4/8/8/8 w - - 0 1')), 0)
+        self.assertLess(endgame_table_value(Board('8/3k4/8/3K4/3P4/8/8/8 b - - 0 1')), 0)
+
+    def test_rook_pawn_with_king_in_the_corner_is_a_draw(self):
+        self.assertEqual(endgame_table_value(Board('k7/8/8/8/8/8/P7/7K w - - 0 1')), 0)
+
+    def test_black_pawn_is_mirrored(self):
+        self.assertEqual(endgame_table_value(Board('8/8/8/8/4p3/4k3/8/4K3 b - - 0 1')), kpk_win_value + 3 * kpk_rank_value)
+        self.assertEqual(endgame_table_value(Board('8/8/8/8/3p4/3k4/8/3K4 w - - 0 1')), -(kpk_win_value + 3 * kpk_rank_value))
+
+    def test_rook_distance_to_mate(self):
+        self.assertEqual(endgame_table_value(Board('6k1/8/6K1/8/8/8/8/R7 w - - 0 1')), krk_win_value - 1)
+        # mirrored, and for black
+        self.assertEqual(endgame_table_value(Board('7r/8/8/8/8/1k6/8/1K6 b - - 0 1')), krk_win_value - 1)
+        # the longest KRK mate takes 16 moves
+        self.assertGreaterEqual(endgame_table_value(Board('8/8/3k4/8/8/8/8/R3K3 w - - 0 1')), krk_win_value - 31)
+
+    def test_undefended_rook_is_a_draw(self):
+        self.assertEqual(endgame_table_value(Board('8/8/8/8/8/1k6/1R6/7K b - - 0 1')), 0)
+
+    def test_other_positions_are_not_in_the_tables(self):
+        self.assertIsNone(endgame_table_value(Board()))
+        self.assertIsNone(endgame_table_value(Board('8/8/8/8/8/1k6/1N6/7K b - - 0 1')))
+
+    # only the king moves that take the opposition win
+    def test_searcher_plays_a_winning_move(self):
+        board = Board('8/8/3k4/8/8/3K4/3P4/8 w - - 0 1')
+        move = Searcher(board, 3, TranspositionTable(1)).next_move()
+        self.assertIn(str(move), ['d3c4', 'd3d4', 'd3e4'])
+
+    def test_searcher_mates_with_the_rook(self):
+        board = Board('6k1/8/6K1/8/8/8/8/R7 w - - 0 1')
+        move = Searcher(board, 3, TranspositionTable(1)).next_move()
+        self.assertEqual(str(move), 'a1a8')
+
+if __name__ == '__main__':
+    unittest.main()
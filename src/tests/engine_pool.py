@@ -0,0 +1,78 @@
+import sys
+sys.path.insert(0, 'src')
+import time
+import unittest
+from unittest import mock
+import engine_pool
+from engine_pool import EnginePool, EnginePoolFull
+
+mate_in_three = 'r5rk/5p1p/5R2/4B3/8/8/7P/7K w - - 0 1'
+dont_sacrifice_rook = '2r3k1/6p1/5p1p/p2r4/3p4/6B1/PPP2PPP/R3R1K1 w - - 0 1'
+
+class EnginePoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = EnginePool(1, queue_size = 1, hash_size_mb = 1)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_search(self):
+        result = self.pool.search(dont_sacrifice_rook, depth = 3, timeout = 30)
+
+        self.assertNotEqual(result['move'], 'e1e8')
+        self.assertEqual(result['depth'], 3)
+
+    def test_search_with_a_time_budget(self):
+        result = self.pool.search(dont_sacrifice_rook, movetime = 200, timeout = 30)
+
+        self.assertLess(result['seconds'], 1)
+        self.assertGreaterEqual(result['depth'], 1)
+
+    def test_same_position_is_searched_once(self):
+        first = self.pool.submit(mate_in_three, depth = 3)
+        second = self.pool.submit(mate_in_three, depth = 3)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.pool.coalesced, 1)
+        self.assertEqual(second.result(30)['move'], 'f6a6')
+
+    def test_full_queue_turns_requests_away(self):
+        futures = [self.pool.submit(dont_sacrifice_rook, depth = depth) for depth in [3, 2]]
+
+        with self.assertRaises(EnginePoolFull):
+            self.pool.submit(dont_sacrifice_rook, depth = 1)
+
+        for future in futures:
+            future.result(30)
+
+        # and takes them again once there is room
+        self.assertEqual(self.pool.search(dont_sacrifice_rook, depth = 1, timeout = 30)['depth'], 1)
+
+    def test_invalid_positions_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.pool.submit('8/8/8/8/8/8/8/8 w - - 0 1', depth = 1)
+
+        # checkmated
+        with self.assertRaises(ValueError):
+            self.pool.submit('rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3', depth = 1)
+
+    def test_dead_worker_fails_its_search_and_is_replaced(self):
+        with mock.patch.object(engine_pool, 'worker_poll_interval', 0.1):
+            future = self.pool.submit(dont_sacrifice_rook, movetime = 30000)
+            coalesced = self.pool.submit(dont_sacrifice_rook, movetime = 30000)
+
+            while self.pool.current_jobs[0] == -1:
+                time.sleep(0.01)
+            self.pool.processes[0].kill()
+
+            with self.assertRaises(RuntimeError):
+                future.result(5)
+            with self.assertRaises(RuntimeError):
+                coalesced.result(5)
+
+            self.assertEqual(self.pool.restarted, 1)
+            self.assertEqual(self.pool.search(dont_sacrifice_rook, depth = 1, timeout = 30)['depth'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
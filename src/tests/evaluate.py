@@ -0,0 +1,39 @@
+import sys
+sys.path.insert(0, 'src')
+import unittest
+import numpy as np
+from board import Board
+from evaluate import batch_evaluate, evaluate_moves
+
+class EvaluateTest(unittest.TestCase):
+
+    def test_batch_evaluate_matches_board_value(self):
+        boards = [
+            Board(),
+            Board('5k2/8/4p3/4Np2/3P4/7r/P3p3/6K1 b - - 0 1'),
+            Board('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+        ]
+
+        values = batch_evaluate(boards)
+
+        self.assertEqual(values.dtype, np.int64)
+        self.assertEqual(values.tolist(), [board.value() for board in boards])
+
+    def test_no_boards(self):
+        self.assertEqual(batch_evaluate([]).tolist(), [])
+        self.assertEqual(evaluate_moves(Board(), []).tolist(), [])
+
+    def test_evaluate_moves_matches_value_after_each_move(self):
+        board = Board('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+        moves = list(board.generate_legal_captures())
+        expected = []
+
+        for move in moves:
+            board.push(move)
+            expected.append(board.value())
+            board.pop()
+
+        self.assertEqual(evaluate_moves(board, moves).tolist(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+sys.path.insert(0, 'src')
+import unittest
+import contextlib
+from unittest import mock
+from multiprocessing import shared_memory
+import lazy_smp
+from board import Board
+from lazy_smp import LazySMPSearcher
+from transposition_table import TranspositionTable
+
+dont_sacrifice_rook = '2r3k1/6p1/5p1p/p2r4/3p4/6B1/PPP2PPP/R3R1K1 w - - 0 1'
+
+# A helper that dies without sending its result
+def crashing_worker(*args):
+    os._exit(1)
+
+class LazySMPTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transposition_table = TranspositionTable(1)
+
+    def tearDown(self):
+        self.transposition_table.release()
+
+    def search(self, workers):
+        board = Board(dont_sacrifice_rook)
+        searcher = LazySMPSearcher(board, 2, self.transposition_table, workers = workers)
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            move = searcher.next_move()
+
+        self.assertIn(move, board.legal_moves)
+        self.assertEqual(searcher.completed_depth, 2)
+
+    def test_two_workers_find_a_legal_move_and_free_the_shared_memory(self):
+        self.search(2)
+        name = self.transposition_table.shared_memory.name
+
+        self.transposition_table.release()
+
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name = name)
+
+    def test_a_dead_helper_does_not_block_the_search(self):
+        with mock.patch.object(lazy_smp, 'search_worker', crashing_worker), mock.patch.object(lazy_smp, 'helper_poll_interval', 0.1):
+            self.search(3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import sys
+sys.path.insert(0, 'src')
+import unittest
+import chess
+from board import Board
+from move_sorter import prioritize_legal_moves, pick_moves, get_moves_to_dequiet, MoveHistory
+
+class MoveSorterTest(unittest.TestCase):
+
+    def test_killer_moves_are_ordered_before_other_quiet_moves(self):
+        board = Board()
+        move_history = MoveHistory()
+        killer = chess.Move.from_uci('a2a3')
+        move_history.store_cutoff(killer, 2, 0)
+
+        moves = prioritize_legal_moves(board, None, move_history, 0)
+
+        self.assertEqual(moves[0], killer)
+
+    def test_history_orders_quiet_moves(self):
+        board = Board()
+        move_history = MoveHistory()
+        move = chess.Move.from_uci('h2h3')
+        move_history.store_cutoff(move, 3, 5)
+
+        self.assertEqual(prioritize_legal_moves(board, None, move_history, 0)[0], move)
+
+    def test_aging_clears_killers_and_halves_history(self):
+        move_history = MoveHistory()
+        move = chess.Move.from_uci('h2h3')
+        move_history.store_cutoff(move, 3, 0)
+
+        move_history.age()
+
+        self.assertEqual(move_history.killers_at(0), [None, None])
+        self.assertEqual(move_history.history[move.from_square][move.to_square], 4)
+
+    def test_hash_move_is_ordered_first(self):
+        board = Board()
+        hash_move = chess.Move.from_uci('b1a3')
+
+        self.assertEqual(prioritize_legal_moves(board, hash_move)[0], hash_move)
+
+    def test_quiescence_skips_losing_captures(self):
+        board = Board('4k3/8/2p5/3p4/4P3/8/3Q4/4K3 w - - 0 1')
+        moves = [str(move) for move in get_moves_to_dequiet(board)]
+
+        self.assertIn('e4d5', moves)
+        self.assertNotIn('d2d5', moves)
+
+    def test_picker_yields_the_hash_move_first(self):
+        board = Board()
+        hash_move = chess.Move.from_uci('b1a3')
+
+        self.assertEqual(next(pick_moves(board, hash_move)), hash_move)
+
+    def test_picker_yields_every_legal_move_once(self):
+        move_history = MoveHistory()
+        move_history.store_cutoff(chess.Move.from_uci('a2a3'), 2, 0)
+        fens = [
+            'r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1',
+            'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+            '3r4/2P3k1/8/8/8/8/8/4K3 w - - 0 1',
+            'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3'
+        ]
+
+        for fen in fens:
+            board = Board(fen)
+            hash_move = chess.Move.from_uci('e1g1') if board.has_kingside_castling_rights(chess.WHITE) else None
+            moves = list(pick_moves(board, hash_move, move_history, 0))
+
+            self.assertEqual(len(moves), len(set(moves)))
+            self.assertEqual(set(moves), set(board.legal_moves))
+
+    def test_picker_yields_castling_and_under_promotions(self):
+        moves = [str(move) for move in pick_moves(Board('rn2k2r/2P5/8/8/8/8/8/R3K2R w KQkq - 0 1'))]
+
+        for move in ['e1g1', 'e1c1', 'c7c8n', 'c7c8b', 'c7c8r', 'c7b8q', 'c7b8n']:
+            self.assertIn(move, moves)
+
+if __name__ == '__main__':
+    unittest.main()
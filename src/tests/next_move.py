@@ -3,6 +3,7 @@ sys.path.insert(0, 'src')
 import unittest
 from board import Board
 from searcher import Searcher
+from search_stats import SearchStats
 from transposition_table import TranspositionTable
 
 class NextMoveTest(unittest.TestCase):
@@ -33,6 +34,45 @@ class NextMoveTest(unittest.TestCase):
         move = Searcher(board, 3, transposition_table).next_move()
         self.assertNotEqual(str(move), 'e1e8')
 
+    def test_principal_variation_search_finds_the_same_move(self):
+        board = Board('1r3rk1/p1p3pp/3bp3/1p1P1q2/P3pP2/2B1P2P/1P4Q1/4K1NR b K - 0 1')
+
+        plain = Searcher(board.copy(), 3, TranspositionTable())
+        plain.principal_variation_search = False
+        plain.aspiration_window = None
+        searcher = Searcher(board.copy(), 3, TranspositionTable())
+
+        self.assertEqual(searcher.next_move(), plain.next_move())
+        self.assertLessEqual(searcher.nodes, plain.nodes)
+        self.assertEqual(searcher.principal_variation[0], 'f8f7')
+
+    def test_pruning_finds_the_same_moves_with_fewer_nodes(self):
+        positions = {
+            '1r3rk1/p1p3pp/3bp3/1p1P1q2/P3pP2/2B1P2P/1P4Q1/4K1NR b K - 0 1': 'f8f7',
+            '1r1qr3/pppbbQ1k/2n1p1p1/2PpP3/3P4/2P2N2/P1B2PP1/1RB1K3 b - - 0 1': 'h7h8',
+            'r5rk/5p1p/5R2/4B3/8/8/7P/7K w': 'f6a6'
+        }
+
+        for fen, expected_move in positions.items():
+            full_width = Searcher(Board(fen), 3, TranspositionTable())
+            full_width.null_move_pruning = False
+            full_width.late_move_reductions = False
+            full_width.delta_pruning = False
+            searcher = Searcher(Board(fen), 3, TranspositionTable())
+
+            self.assertEqual(str(full_width.next_move()), expected_move)
+            self.assertEqual(str(searcher.next_move()), expected_move)
+            self.assertLessEqual(searcher.nodes, full_width.nodes)
+
+    # Zugzwang is common when only pawns are left, so the side to move is never assumed to be better off than by passing
+    def test_no_null_move_with_only_pawns(self):
+        stats = SearchStats()
+        board = Board('8/8/1p2k1p1/3p3p/1p1P1P1P/1P2PK2/8/8 w - - 3 54')
+        Searcher(board, 4, TranspositionTable(1), stats = stats).next_move()
+
+        self.assertEqual(stats.null_move_cutoffs, 0)
+        self.assertGreater(stats.late_move_reductions, 0)
+
     # Review the end of this game: https://lichess.org/Bk7qEJiX#94
     # Figure out how to prevent the passed pawn from reaching promotion
     # def test_prevent_opponent_pawn_promotion(self):
@@ -0,0 +1,72 @@
+import os
+import sys
+sys.path.insert(0, 'src')
+import struct
+import tempfile
+import unittest
+import chess
+import chess.polyglot
+from board import Board
+from searcher import Searcher
+from opening_book import OpeningBook
+from transposition_table import TranspositionTable
+
+castling_fen = 'r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1'
+
+# polyglot move encoding: to square, from square << 6 (castling as the king taking its own rook)
+def write_book(path, entries):
+    with open(path, 'wb') as f:
+        for key, from_square, to_square, weight in sorted(entries):
+            f.write(struct.pack('>QHHI', key, to_square | (from_square << 6), weight, 0))
+
+class OpeningBookTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix = '.bin')
+        os.close(handle)
+
+        start = chess.polyglot.zobrist_hash(chess.Board())
+        write_book(self.path, [
+            (start, chess.E2, chess.E4, 10),
+            (start, chess.D2, chess.D4, 1),
+            (chess.polyglot.zobrist_hash(chess.Board(castling_fen)), chess.E1, chess.H1, 1)
+        ])
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_best_selection_picks_the_highest_weight(self):
+        book = OpeningBook(self.path, 'best')
+
+        self.assertEqual(str(book.probe(Board())), 'e2e4')
+        book.close()
+
+    def test_weighted_selection_only_picks_book_moves(self):
+        book = OpeningBook(self.path, 'weighted', seed = 1)
+        moves = { str(book.probe(Board())) for _ in range(50) }
+
+        self.assertEqual(moves, { 'e2e4', 'd2d4' })
+        book.close()
+
+    def test_castling_is_converted_to_a_king_move(self):
+        book = OpeningBook(self.path, 'best')
+
+        self.assertEqual(str(book.probe(Board(castling_fen))), 'e1g1')
+        book.close()
+
+    def test_book_is_not_probed_past_max_ply(self):
+        book = OpeningBook(self.path, 'best', max_ply = 0)
+
+        self.assertIsNone(book.probe(Board()))
+        book.close()
+
+    def test_searcher_plays_book_moves_without_searching(self):
+        book = OpeningBook(self.path, 'best')
+        searcher = Searcher(Board(), 3, TranspositionTable(1), opening_book = book)
+
+        self.assertEqual(str(searcher.next_move()), 'e2e4')
+        self.assertEqual(searcher.nodes, 0)
+        book.close()
+
+if __name__ == '__main__':
+    unittest.main()
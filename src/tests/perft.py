@@ -0,0 +1,21 @@
+import sys
+sys.path.insert(0, 'src')
+import unittest
+from board import Board
+from perft import perft, divide, run_suite, perft_positions, move_generators
+
+class PerftTest(unittest.TestCase):
+
+    def test_node_counts_match_for_every_move_generator(self):
+        for result in run_suite(2, list(move_generators)):
+            self.assertTrue(result['correct'], f"{result['position']} ({result['mode']}): {result['nodes']} != {result['expected_nodes']}")
+
+    def test_divide_adds_up_to_perft(self):
+        position = perft_positions[1]
+        counts = divide(2, Board(position['fen']), move_generators['staged'])
+
+        self.assertEqual(len(counts), position['nodes'][0])
+        self.assertEqual(sum(counts.values()), perft(2, Board(position['fen'])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import sys
+sys.path.insert(0, 'src')
+import unittest
+from board import Board
+from root_parallel import RootParallelPool, RootParallelSearcher
+from transposition_table import TranspositionTable
+
+class RootParallelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transposition_table = TranspositionTable(1)
+        self.pool = RootParallelPool(self.transposition_table, 2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+        self.transposition_table.release()
+
+    def test_mate_in_three(self):
+        board = Board('r5rk/5p1p/5R2/4B3/8/8/7P/7K w')
+        move = RootParallelSearcher(board, 3, self.pool).next_move()
+        self.assertEqual(str(move), 'f6a6')
+
+    def test_dont_sacrifice_rook(self):
+        board = Board('2r3k1/6p1/5p1p/p2r4/3p4/6B1/PPP2PPP/R3R1K1 w - - 0 1')
+        move = RootParallelSearcher(board, 3, self.pool).next_move()
+        self.assertNotEqual(str(move), 'e1e8')
+
+if __name__ == '__main__':
+    unittest.main()
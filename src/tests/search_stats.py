@@ -0,0 +1,56 @@
+import sys
+sys.path.insert(0, 'src')
+import unittest
+from board import Board
+from searcher import Searcher
+from search_stats import SearchStats
+from transposition_table import TranspositionTable
+from bench import bench_position
+
+class SearchStatsTest(unittest.TestCase):
+
+    def test_counts_every_node(self):
+        stats = SearchStats()
+        searcher = Searcher(Board('8/8/1p2k1p1/3p3p/1p1P1P1P/1P2PK2/8/8 w - - 3 54'), 3, TranspositionTable(1), stats = stats)
+        searcher.next_move()
+
+        self.assertEqual(stats.total_nodes(), searcher.nodes)
+        self.assertEqual([depth for depth, _, _ in stats.iterations], [1, 2, 3])
+        self.assertEqual(stats.iterations[-1][2], searcher.nodes)
+        self.assertLessEqual(stats.tt_cutoffs, stats.tt_hits)
+        self.assertLessEqual(stats.first_move_cutoffs, stats.beta_cutoffs)
+        self.assertEqual(stats.searches, 1)
+
+    def test_effective_branching_factor_uses_the_last_two_iterations(self):
+        stats = SearchStats()
+        stats.iterations = [(1, 0.1, 10), (2, 0.2, 40), (3, 0.5, 130)]
+
+        self.assertEqual(stats.effective_branching_factor(), 3)
+
+    def test_merge_adds_up_counters(self):
+        totals = SearchStats()
+        stats = SearchStats()
+        stats.searches = 1
+        stats.nodes = 10
+        stats.times['evaluation'] = 0.5
+
+        totals.merge(stats)
+        totals.merge(stats)
+
+        self.assertEqual(( totals.searches, totals.nodes, totals.times['evaluation'] ), ( 2, 20, 1.0 ))
+
+    def test_prometheus_format(self):
+        stats = SearchStats()
+        stats.quiescence_nodes = 42
+        lines = stats.prometheus().splitlines()
+
+        self.assertIn('# TYPE chess_ai_nodes_total counter', lines)
+        self.assertIn('chess_ai_nodes_total{type="quiescence"} 42', lines)
+
+    def test_bench_node_counts_are_deterministic(self):
+        fen = '4k3/3R4/4p3/4Np2/3P4/4p2r/P7/6K1 w - - 0 1'
+
+        self.assertEqual(bench_position(fen, 2, 1)['nodes'], bench_position(fen, 2, 1)['nodes'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import sys
+sys.path.insert(0, 'src')
+import unittest
+import chess
+from board import Board
+from static_exchange import static_exchange_evaluation
+
+class StaticExchangeTest(unittest.TestCase):
+
+    def test_undefended_capture_wins_the_piece(self):
+        board = Board('1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1')
+        self.assertEqual(static_exchange_evaluation(board, chess.Move.from_uci('e1e5')), 100)
+
+    def test_queen_takes_pawn_defended_by_pawn_loses(self):
+        board = Board('4k3/8/2p5/3p4/8/8/3Q4/4K3 w - - 0 1')
+        self.assertEqual(static_exchange_evaluation(board, chess.Move.from_uci('d2d5')), 100 - 900)
+
+    def test_xray_attackers_join_the_exchange(self):
+        board = Board('1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1')
+        self.assertEqual(static_exchange_evaluation(board, chess.Move.from_uci('d3e5')), 100 - 320)
+
+    def test_en_passant_capture(self):
+        board = Board('4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1')
+        self.assertEqual(static_exchange_evaluation(board, chess.Move.from_uci('e5d6')), 100)
+
+    def test_king_cannot_recapture_defended_piece(self):
+        board = Board('3rk3/3r4/8/8/8/8/3q4/3RK3 w - - 0 1')
+        self.assertEqual(static_exchange_evaluation(board, chess.Move.from_uci('d1d2')), 900 - 500)
+
+    def test_king_recaptures_undefended_piece(self):
+        board = Board('4k3/3r4/8/8/8/8/3q4/3RK3 w - - 0 1')
+        self.assertEqual(static_exchange_evaluation(board, chess.Move.from_uci('d1d2')), 900)
+
+if __name__ == '__main__':
+    unittest.main()
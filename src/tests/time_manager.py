@@ -0,0 +1,28 @@
+import sys
+sys.path.insert(0, 'src')
+import unittest
+import chess
+from time_manager import allocate_time, move_overhead
+
+class TimeManagerTest(unittest.TestCase):
+
+    def test_no_limits_without_clock(self):
+        self.assertEqual(allocate_time(chess.WHITE), (None, None))
+
+    def test_movetime_is_used_as_is(self):
+        self.assertEqual(allocate_time(chess.WHITE, movetime = 1000), (1 - move_overhead, 1 - move_overhead))
+
+    def test_uses_clock_of_side_to_move(self):
+        white_soft_limit, _ = allocate_time(chess.WHITE, wtime = 60000, btime = 6000)
+        black_soft_limit, _ = allocate_time(chess.BLACK, wtime = 60000, btime = 6000)
+
+        self.assertGreater(white_soft_limit, black_soft_limit)
+
+    def test_never_uses_most_of_the_remaining_time(self):
+        soft_limit, hard_limit = allocate_time(chess.WHITE, wtime = 1000, winc = 5000, movestogo = 1)
+
+        self.assertLessEqual(soft_limit, hard_limit)
+        self.assertLess(hard_limit, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+sys.path.insert(0, 'src')
+import tempfile
+import unittest
+from board import Board
+from searcher import Searcher
+from tracer import SearchTracer, read_trace
+from transposition_table import TranspositionTable
+
+class TracerTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix = '.jsonl')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def search(self, tracer = None):
+        searcher = Searcher(Board('4k3/3R4/4p3/4Np2/3P4/4p2r/P7/6K1 w - - 0 1'), 2, TranspositionTable(1), tracer = tracer)
+        searcher.next_move()
+
+        if tracer is not None:
+            tracer.close()
+
+        return searcher
+
+    def test_untraced_search_uses_the_plain_method(self):
+        self.assertNotIn('negamax', vars(self.search()))
+
+    def test_every_node_is_written(self):
+        searcher = self.search(SearchTracer(self.path))
+        nodes = list(read_trace(self.path))
+        ids = { node['id'] for node in nodes }
+
+        self.assertEqual(len(nodes), searcher.nodes)
+        self.assertEqual([node['depth'] for node in nodes if node['parent'] is None], [1, 2])
+        self.assertTrue(all(node['parent'] is None or node['parent'] in ids for node in nodes))
+
+    def test_filtered_nodes_are_attached_to_the_nearest_written_ancestor(self):
+        self.search(SearchTracer(self.path, max_ply = 3, min_depth = -1, sample_rate = 0.5))
+        nodes = list(read_trace(self.path))
+        ids = { node['id'] for node in nodes }
+
+        self.assertTrue(all(node['ply'] <= 3 and node['depth'] >= -1 for node in nodes))
+        self.assertTrue(all(node['parent'] is None or node['parent'] in ids for node in nodes))
+
+    def test_read_trace_filters_by_ply(self):
+        self.search(SearchTracer(self.path))
+
+        self.assertTrue(all(node['ply'] <= 1 for node in read_trace(self.path, max_ply = 1)))
+
+if __name__ == '__main__':
+    unittest.main()
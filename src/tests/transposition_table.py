@@ -1,19 +1,27 @@
+import os
 import sys
 sys.path.insert(0, 'src')
+import shutil
+import tempfile
 import unittest
+import contextlib
 import chess
 import chess.polyglot
-from transposition_table import TranspositionTable, HashEntry
+import numpy as np
+import transposition_table
+from board import Board
+from transposition_table import TranspositionTable, HashEntry, Flag, entries_for_size, entry_size, export_record, export_json
 
 class TranspositionTableTest(unittest.TestCase):
 
     def setUp(self):
-        self.table = TranspositionTable()
+        self.table = TranspositionTable(1)
+        self.move = chess.Move.from_uci('e2e4')
 
     def test_store_move_if_empty(self):
         board = chess.Board()
         zobrist = chess.polyglot.zobrist_hash(board)
-        hash_entry = HashEntry(zobrist, 'e2e4', 5, 20, (-50, 50), 0)
+        hash_entry = HashEntry(zobrist, self.move, 5, 20, Flag.EXACT, 0)
 
         self.table.replace(hash_entry)
 
@@ -22,9 +30,9 @@ class TranspositionTableTest(unittest.TestCase):
     def test_replace_if_age_is_greater(self):
         board = chess.Board()
         zobrist = chess.polyglot.zobrist_hash(board)
-        old_hash_entry = HashEntry(zobrist, 'e2e4', 5, 20, (-50, 50), 0)
+        old_hash_entry = HashEntry(zobrist, self.move, 5, 20, Flag.EXACT, 0)
         self.table.replace(old_hash_entry)
-        new_hash_entry = HashEntry(zobrist, 'e2e4', 5, 20, (-50, 50), 2)
+        new_hash_entry = HashEntry(zobrist, self.move, 5, 20, Flag.EXACT, 2)
 
         self.table.replace(new_hash_entry)
 
@@ -33,9 +41,9 @@ class TranspositionTableTest(unittest.TestCase):
     def test_replace_if_depth_is_greater_and_age_equal(self):
         board = chess.Board()
         zobrist = chess.polyglot.zobrist_hash(board)
-        shallow_hash_entry = HashEntry(zobrist, 'e2e4', 4, 20, (-50, 50), 0)
+        shallow_hash_entry = HashEntry(zobrist, self.move, 4, 20, Flag.EXACT, 0)
         self.table.replace(shallow_hash_entry)
-        deep_hash_entry = HashEntry(zobrist, 'e2e4', 5, 20, (-50, 50), 0)
+        deep_hash_entry = HashEntry(zobrist, self.move, 5, 20, Flag.EXACT, 0)
 
         self.table.replace(deep_hash_entry)
 
@@ -44,13 +52,150 @@ class TranspositionTableTest(unittest.TestCase):
     def test_do_not_replace_if_depth_is_lesser_and_age_equal(self):
         board = chess.Board()
         zobrist = chess.polyglot.zobrist_hash(board)
-        deep_hash_entry = HashEntry(zobrist, 'e2e4', 5, 20, (-50, 50), 0)
+        deep_hash_entry = HashEntry(zobrist, self.move, 5, 20, Flag.EXACT, 0)
         self.table.replace(deep_hash_entry)
-        shallow_hash_entry = HashEntry(zobrist, 'e2e4', 4, 20, (-50, 50), 0)
+        shallow_hash_entry = HashEntry(zobrist, self.move, 4, 20, Flag.EXACT, 0)
 
         self.table.replace(shallow_hash_entry)
 
         self.assertEqual(self.table.get(zobrist, 5), deep_hash_entry)
 
+    def test_round_trip_packed_fields(self):
+        board = chess.Board('8/P7/8/8/8/8/8/k6K w - - 0 1')
+        zobrist = chess.polyglot.zobrist_hash(board)
+        hash_entry = HashEntry(zobrist, chess.Move.from_uci('a7a8n'), -3, -99999, Flag.UPPER_BOUND, 57)
+
+        self.table.replace(hash_entry)
+
+        self.assertEqual(self.table.get(zobrist, -3), hash_entry)
+        self.assertEqual(list(self.table.entries()), [hash_entry])
+
+    def test_size_is_configured_in_megabytes(self):
+        self.table.resize(2)
+
+        self.assertEqual(self.table.size, entries_for_size(2))
+        self.assertEqual(self.table.buffer.nbytes, self.table.size * entry_size)
+
+    def test_hashfull_is_sampled_from_the_first_slots(self):
+        for zobrist in range(500):
+            self.table.replace(HashEntry(zobrist, None, 1, 0, Flag.EXACT, 0))
+
+        self.assertEqual(self.table.hashfull(), 500)
+
+    def test_principal_variation_round_trip(self):
+        board = Board()
+        principal_variation = ['e2e4', 'e7e5', 'g1f3', 'b8c6']
+        self.table.replace(HashEntry(board.zobrist, chess.Move.from_uci('d2d4'), 3, 20, Flag.EXACT, 0))
+
+        self.table.store_principal_variation(board, principal_variation)
+
+        self.assertEqual([move.uci() for move in self.table.get_principal_variation(board)], principal_variation)
+        self.assertEqual(board, Board())
+        # the stored entry keeps its bound, only its move changes
+        self.assertEqual(self.table.get(board.zobrist, 3).value, 20)
+
+    def test_principal_variation_stops_at_a_repetition(self):
+        board = Board()
+        self.table.store_principal_variation(board, ['g1f3', 'g8f6', 'f3g1', 'f6g8'])
+
+        self.assertEqual(len(self.table.get_principal_variation(board)), 4)
+
+class TranspositionTableExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = TranspositionTable(1)
+        self.entries = [
+            HashEntry(index * 97 + 5, chess.Move.from_uci('e2e4'), index % 4, index, Flag(index % 3), 1)
+            for index in range(50)
+        ]
+        for entry in self.entries:
+            self.table.replace(entry)
+
+    def test_pages_cover_every_entry_once(self):
+        keys = []
+        cursor = 0
+        while cursor is not None:
+            records, cursor = self.table.export_page(cursor, 7)
+            self.assertLessEqual(len(records), 7)
+            keys += [int(key) for key in records['key']]
+
+        self.assertEqual(keys, [entry.zobrist for entry in self.entries])
+
+    def test_filters(self):
+        records, cursor = self.table.export_page(0, 100, min_depth = 2, flag = Flag.EXACT)
+
+        self.assertIsNone(cursor)
+        self.assertEqual(list(export_json(records)), [entry.json() for entry in self.entries if entry.depth >= 2 and entry.flag == Flag.EXACT])
+
+    def test_invalid_pages_are_rejected(self):
+        with self.assertRaises(AssertionError):
+            self.table.export_page(-7, 7)
+        with self.assertRaises(AssertionError):
+            self.table.export_page(0, 0)
+
+    def test_binary_records(self):
+        records, _ = self.table.export_page(0, 1)
+        record = np.frombuffer(records.tobytes(), dtype = export_record)[0]
+
+        self.assertEqual(export_record.itemsize, 18)
+        self.assertEqual(( int(record['key']), int(record['depth']), int(record['flag']) ), ( 5, 0, Flag.EXACT.value ))
+
+    def test_summary(self):
+        summary = self.table.summary()
+
+        self.assertEqual(summary['entries'], 50)
+        self.assertEqual(summary['depths'], { 0: 13, 1: 13, 2: 12, 3: 12 })
+        self.assertEqual(summary['flags'], { 'EXACT': 17, 'LOWER_BOUND': 17, 'UPPER_BOUND': 16 })
+        self.assertEqual(summary['ages'], { 'min': 1, 'max': 1 })
+
+class TranspositionTableFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'hash.bin')
+        self.entry = HashEntry(123456789, chess.Move.from_uci('e2e4'), 4, 35, Flag.LOWER_BOUND, 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_entries_survive_a_restart(self):
+        table = TranspositionTable(1, self.path)
+        table.replace(self.entry)
+        table.release()
+
+        self.assertEqual(TranspositionTable(1, self.path).get(self.entry.zobrist, 4), self.entry)
+
+    def test_stale_generation_is_discarded(self):
+        table = TranspositionTable(1, self.path)
+        table.replace(self.entry)
+        table.release()
+
+        generation = transposition_table.table_generation
+        transposition_table.table_generation = generation + 1
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull):
+                table = TranspositionTable(1, self.path)
+        finally:
+            transposition_table.table_generation = generation
+
+        self.assertIsNone(table.get(self.entry.zobrist, 4))
+
+    def test_other_size_is_discarded(self):
+        table = TranspositionTable(1, self.path)
+        table.replace(self.entry)
+        table.release()
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull):
+            table = TranspositionTable(2, self.path)
+
+        self.assertIsNone(table.get(self.entry.zobrist, 4))
+
+    def test_attach_shared_maps_the_same_file(self):
+        table = TranspositionTable(1, self.path)
+        attached = TranspositionTable.attach_shared(table.share(), 1)
+        attached.replace(self.entry)
+
+        self.assertEqual(table.get(self.entry.zobrist, 4), self.entry)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,26 @@
+import chess
+
+# Reserved for communication with lichess (and process scheduling) on every move
+move_overhead = 0.05
+# Number of moves the remaining time is assumed to be spread over when movestogo is not provided
+default_moves_to_go = 30
+
+# Returns (soft_limit, hard_limit) in seconds, or (None, None) if the search is not time limited.
+# The soft limit is the time the search aims to use, the hard limit is where a running search is aborted.
+def allocate_time(turn, wtime = None, btime = None, winc = 0, binc = 0, movestogo = None, movetime = None):
+    if movetime is not None:
+        limit = max(movetime / 1000 - move_overhead, 0.01)
+        return ( limit, limit )
+
+    remaining, increment = (wtime, winc) if turn == chess.WHITE else (btime, binc)
+
+    if remaining is None:
+        return ( None, None )
+
+    remaining = max(remaining / 1000 - move_overhead, 0.01)
+    target = remaining / (movestogo or default_moves_to_go) + (increment or 0) / 1000 * 0.75
+
+    hard_limit = min(target * 3, remaining * 0.8)
+    soft_limit = min(target, hard_limit)
+
+    return ( soft_limit, hard_limit )
@@ -0,0 +1,94 @@
+import json
+import random
+
+# Search tree tracing, for debugging how the engine decided on a move. Off by default: a Searcher only routes its
+# negamax calls through a tracer when it is given one, so searches without a tracer run the plain method.
+#
+# Every searched node (that passes the filters) is written as one JSON line, once its value is known, so children
+# come before their parents and each iteration's root comes last:
+#   {"id":12,"parent":3,"name":"e2e4","ply":1,"depth":2,"alpha":-99999,"beta":99999,"is_white":true,"zobrist":...,"value":35}
+# alpha, beta and value are from the point of view of the side that made the move. Nodes that are filtered out are
+# skipped, and their children are attached to the nearest ancestor that was written (the root always is).
+
+default_trace_path = 'trace.jsonl'
+
+class SearchTracer:
+    # max_ply: only nodes up to this many plies below the root
+    # min_depth: only nodes with at least this much depth left (negative depths are quiescence nodes)
+    # sample_rate: fraction of the (remaining) nodes to write, chosen at random with a fixed seed
+    def __init__(self, path = default_trace_path, max_ply = None, min_depth = None, sample_rate = 1.0, seed = 0):
+        self.path = path
+        self.max_ply = max_ply
+        self.min_depth = min_depth
+        self.sample_rate = sample_rate
+        self.random = random.Random(seed)
+        self.file = open(path, 'w')
+        self.next_id = 0
+        # id of the nearest written ancestor of the node being searched
+        self.parents = [None]
+
+    def close(self):
+        self.file.close()
+
+    # the root of each iteration is always written, so that every other node has an ancestor in the file
+    def should_write(self, ply, depth):
+        if ply == 0:
+            return True
+
+        if self.max_ply is not None and ply > self.max_ply:
+            return False
+
+        if self.min_depth is not None and depth < self.min_depth:
+            return False
+
+        return self.sample_rate >= 1 or self.random.random() < self.sample_rate
+
+    # Returns a replacement for the searcher's (bound) negamax that records every call
+    def trace(self, searcher, negamax):
+        def traced_negamax(board, depth, alpha, beta, pline = []):
+            ply = len(board.move_stack) - searcher.root_ply
+            parent_id = self.parents[-1]
+
+            if not self.should_write(ply, depth):
+                self.parents.append(parent_id)
+
+                try:
+                    return negamax(board, depth, alpha, beta, pline)
+                finally:
+                    self.parents.pop()
+
+            node_id = self.next_id
+            self.next_id += 1
+            node = {
+                'id': node_id,
+                'parent': parent_id,
+                'name': board.peek().uci() if ply > 0 else 'root',
+                'ply': ply,
+                'depth': depth,
+                'alpha': -beta,
+                'beta': -alpha,
+                'is_white': not board.turn,
+                'zobrist': board.zobrist
+            }
+
+            self.parents.append(node_id)
+            try:
+                result = negamax(board, depth, alpha, beta, pline)
+            finally:
+                self.parents.pop()
+
+            node['value'] = -result[1]
+            self.file.write(json.dumps(node, separators = (',', ':')) + '\n')
+
+            return result
+
+        return traced_negamax
+
+# Yields the nodes of a trace file one at a time, without loading the whole file
+def read_trace(path = default_trace_path, max_ply = None):
+    with open(path) as f:
+        for line in f:
+            node = json.loads(line)
+
+            if max_ply is None or node['ply'] <= max_ply:
+                yield node
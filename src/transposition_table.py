@@ -1,3 +1,6 @@
+import os
+import sys
+import chess
 import numpy as np
 from enum import Enum
 
@@ -16,6 +19,9 @@ class HashEntry:
         self.flag = flag
         self.age = age
 
+    def __eq__(self, other):
+        return isinstance(other, HashEntry) and self.__dict__ == other.__dict__
+
     def json(self):
         return {
             'zobrist': self.zobrist,
@@ -26,30 +32,386 @@ class HashEntry:
             'age': self.age
         }
 
-# 2^20 + 7 (prime number)
-table_size = 1048583
+# The table is stored as parallel arrays (one per field) rather than as an array of HashEntry objects.
+# Fields are ordered by item size so that every array in the shared buffer is aligned.
+entry_fields = [
+    ('keys', np.uint64),
+    ('values', np.int32),
+    ('moves', np.uint16),
+    # low 2 bits hold the flag (0 means the slot is empty), the rest hold the age
+    ('flags', np.uint16),
+    ('depths', np.int8)
+]
+entry_size = sum(np.dtype(dtype).itemsize for _, dtype in entry_fields)
+
+default_size_mb = 16
+max_age = (1 << 14) - 1
+
+# Tables can be kept in a file (see map_file), which starts with a header describing its contents.
+# table_file_version changes with the layout of the file; table_generation must be bumped whenever stored values or
+# moves would no longer be valid (evaluation, zobrist keys or move encoding changes), so that older tables are discarded.
+table_file_magic = b'CHESSTT'
+table_file_version = 1
+table_generation = 1
+table_header = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('generation', '<u4'),
+    ('entry_size', '<u4'),
+    ('reserved', '<u4'),
+    ('entries', '<u8')
+])
+# the entries start 8-byte aligned
+table_header_size = 64
+# share() names of file backed tables, so that attach_shared maps the file instead of a shared memory block
+table_file_prefix = 'file:'
+
+# Record of the binary export (see export_page): little endian and packed, 18 bytes per entry
+export_record = np.dtype([
+    ('key', '<u8'),
+    ('value', '<i4'),
+    ('move', '<u2'),
+    ('age', '<u2'),
+    ('depth', 'i1'),
+    # Flag value
+    ('flag', 'u1')
+])
+# slots scanned at a time when looking for the entries of an export page
+export_chunk_size = 1 << 16
+
+def entries_for_size(size_mb):
+    return max(1, int(size_mb * 1024 * 1024) // entry_size)
+
+# from square (6 bits), to square (6 bits), promotion piece type (3 bits); 0 means no move
+def encode_move(move):
+    if not move:
+        return 0
+
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+def decode_move(code):
+    if code == 0:
+        return None
+
+    return chess.Move(code & 63, (code >> 6) & 63, (code >> 12) or None)
+
+def encode_flag(flag, age):
+    return (min(age, max_age) << 2) | (flag.value + 1)
+
+# The entries of export records as JSON, in the format of HashEntry.json
+def export_json(records):
+    for record in records:
+        yield {
+            'zobrist': int(record['key']),
+            'best_move': str(decode_move(int(record['move']))),
+            'depth': int(record['depth']),
+            'value': int(record['value']),
+            'flag': Flag(int(record['flag'])).name,
+            'age': int(record['age'])
+        }
 
 class TranspositionTable:
 
-    def __init__(self):
-        self.table = np.empty(table_size, dtype = HashEntry)
+    # path: keep the table in this file, so that it survives restarts (see map_file)
+    def __init__(self, size_mb = default_size_mb, path = None):
+        self.shared_memory = None
+        self.memmap = None
+        self.path = path
+        self.owner = True
+        self.resize(size_mb)
+
+    # Resizing discards the stored entries (and, for a file backed table, recreates the file)
+    def resize(self, size_mb):
+        shared = self.shared_memory is not None
+        self.release()
+
+        self.size_mb = size_mb
+        self.size = entries_for_size(size_mb)
+
+        if self.path is not None:
+            self.map_file(self.path)
+        else:
+            self.bind(np.zeros(self.size * entry_size, dtype = np.uint8))
+
+        if shared:
+            self.share()
+
+    # Moves the table to a file (or back to memory, when path is None); the entries of a compatible existing file are kept
+    def set_path(self, path):
+        self.release()
+        self.path = path
+        self.resize(self.size_mb)
+
+    # Maps the table file into memory with np.memmap: nothing is read at startup, pages are loaded as they are probed,
+    # and writes reach the file through the page cache. A file with a different format version, generation or size
+    # is replaced by an empty table.
+    def map_file(self, path):
+        length = table_header_size + self.size * entry_size
+        problem = self.check_file(path, length)
+
+        if problem is None:
+            self.memmap = np.memmap(path, dtype = np.uint8, mode = 'r+', shape = (length,))
+        else:
+            if problem != 'missing':
+                print(f"Discarding transposition table file {path}: {problem}", file = sys.stderr)
+
+            self.memmap = np.memmap(path, dtype = np.uint8, mode = 'w+', shape = (length,))
+            header = np.zeros(1, dtype = table_header)
+            header[0] = (table_file_magic, table_file_version, table_generation, entry_size, 0, self.size)
+            self.memmap[:table_header.itemsize] = header.view(np.uint8)
+
+        self.bind(self.memmap[table_header_size:])
+
+    def check_file(self, path, length):
+        if not os.path.exists(path):
+            return 'missing'
+
+        if os.path.getsize(path) != length:
+            return 'size does not match'
+
+        header = np.fromfile(path, dtype = table_header, count = 1)[0]
+
+        if header['magic'] != table_file_magic or header['version'] != table_file_version or header['entry_size'] != entry_size:
+            return 'incompatible format'
+        if header['generation'] != table_generation:
+            return 'stale generation'
+        if header['entries'] != self.size:
+            return 'size does not match'
+
+        return None
+
+    # Writes the changed pages of a file backed table to disk
+    def flush(self):
+        if self.memmap is not None:
+            self.memmap.flush()
+
+    # Moves the table into shared memory, so that it can be attached to by other processes (see attach_shared).
+    # Entries are written without locking; a torn entry can at worst return a wrong move, so moves read
+    # from the table must always be checked for legality.
+    # A file backed table is already shareable: the other processes map the same file.
+    # Requires python 3.8+ (multiprocessing.shared_memory)
+    def share(self):
+        if self.memmap is not None:
+            return table_file_prefix + self.path
+
+        if self.shared_memory is not None:
+            return self.shared_memory.name
+
+        from multiprocessing import shared_memory
+
+        contents = self.buffer
+        self.shared_memory = shared_memory.SharedMemory(create = True, size = contents.nbytes)
+        self.bind(np.ndarray(contents.nbytes, dtype = np.uint8, buffer = self.shared_memory.buf))
+        self.buffer[:] = contents
+
+        return self.shared_memory.name
+
+    @classmethod
+    def attach_shared(cls, name, size_mb):
+        if name.startswith(table_file_prefix):
+            table = cls(size_mb, name[len(table_file_prefix):])
+            table.owner = False
+            return table
+
+        from multiprocessing import shared_memory
+
+        table = cls.__new__(cls)
+        table.size_mb = size_mb
+        table.size = entries_for_size(size_mb)
+        table.shared_memory = shared_memory.SharedMemory(name = name)
+        table.memmap = None
+        table.path = None
+        table.owner = False
+        table.bind(np.ndarray(table.size * entry_size, dtype = np.uint8, buffer = table.shared_memory.buf))
+
+        return table
+
+    # Frees the shared memory block (or detaches from it, if it was created by another process), or writes a file
+    # backed table to disk and unmaps it
+    def release(self):
+        if self.memmap is not None:
+            self.memmap.flush()
+            self.bind(np.zeros(0, dtype = np.uint8))
+            self.memmap = None
+
+        if self.shared_memory is None:
+            return
+
+        # the numpy views must be dropped before the shared memory can be closed
+        self.bind(np.zeros(0, dtype = np.uint8))
+        self.shared_memory.close()
+        if self.owner:
+            self.shared_memory.unlink()
+        self.shared_memory = None
+
+    # Lay the parallel arrays out over a single preallocated buffer
+    def bind(self, buffer):
+        self.buffer = buffer
+        offset = 0
+        count = buffer.nbytes // entry_size
+
+        for name, dtype in entry_fields:
+            array = np.frombuffer(buffer, dtype = dtype, count = count, offset = offset)
+            setattr(self, name, array)
+            offset += array.nbytes
+
+    def clear(self):
+        self.buffer[:] = 0
+
+    def entry_at(self, index):
+        packed_flag = int(self.flags[index])
+
+        return HashEntry(
+            int(self.keys[index]),
+            decode_move(int(self.moves[index])),
+            int(self.depths[index]),
+            int(self.values[index]),
+            Flag((packed_flag & 3) - 1),
+            packed_flag >> 2
+        )
+
+    # Yields every stored entry (of a snapshot of the occupied slots, since a shared table may be written to concurrently)
+    def entries(self):
+        for index in np.flatnonzero(self.flags.copy()):
+            yield self.entry_at(index)
+
+    # One page of the stored entries, in slot order, as an array of export_record, and the cursor (slot index) that the
+    # next page starts from (None after the last page). Only the slots up to the end of the page are scanned, in chunks.
+    def export_page(self, cursor = 0, page_size = 1000, min_depth = None, max_depth = None, flag = None):
+        assert cursor >= 0 and page_size > 0, f"invalid page: cursor {cursor}, page size {page_size}"
+        pages = []
+        count = 0
+
+        while cursor < self.size and count < page_size:
+            end = min(cursor + max(page_size, export_chunk_size), self.size)
+            # a snapshot, since a shared table may be written to concurrently
+            flags = self.flags[cursor:end].copy()
+            depths = self.depths[cursor:end]
+            selected = flags != 0
+
+            if min_depth is not None:
+                selected &= depths >= min_depth
+            if max_depth is not None:
+                selected &= depths <= max_depth
+            if flag is not None:
+                selected &= (flags & 3) == flag.value + 1
+
+            indices = np.flatnonzero(selected)[:page_size - count] + cursor
+            pages.append(indices)
+            count += len(indices)
+            cursor = int(indices[-1]) + 1 if count == page_size else end
+
+        indices = np.concatenate(pages) if pages else np.zeros(0, dtype = np.int64)
+        flags = self.flags[indices]
+
+        records = np.zeros(len(indices), dtype = export_record)
+        records['key'] = self.keys[indices]
+        records['value'] = self.values[indices]
+        records['move'] = self.moves[indices]
+        records['age'] = flags >> 2
+        records['depth'] = self.depths[indices]
+        records['flag'] = (flags & 3) - 1
+
+        return ( records, cursor if cursor < self.size else None )
+
+    # Fill rate, depth histogram and flag mix, counted over the arrays without creating entries
+    def summary(self):
+        flags = self.flags.copy()
+        used = flags != 0
+        entries = int(np.count_nonzero(used))
+        depths, depth_counts = np.unique(self.depths[used], return_counts = True)
+        flag_counts = np.bincount(flags[used] & 3, minlength = 4)
+        ages = flags[used] >> 2
+
+        return {
+            'size': self.size,
+            'size_mb': self.size_mb,
+            'entries': entries,
+            'fill_rate': round(entries / self.size, 4),
+            'depths': { int(depth): int(count) for depth, count in zip(depths, depth_counts) },
+            'flags': { flag.name: int(flag_counts[flag.value + 1]) for flag in Flag },
+            'ages': { 'min': int(ages.min()), 'max': int(ages.max()) } if entries else None
+        }
 
     # There are different replacement schemes that can be used -- always replace, replace by depth, deep + always
     # This is currently using replace by depth
     def replace(self, hash_entry):
-        index = hash_entry.zobrist % table_size
-        stored_entry = self.table[index]
+        index = hash_entry.zobrist % self.size
+        packed_flag = int(self.flags[index])
 
-        if not stored_entry or hash_entry.age > stored_entry.age or hash_entry.depth > stored_entry.depth:
-            np.put(self.table, index, hash_entry)
+        if not packed_flag or hash_entry.age > packed_flag >> 2 or hash_entry.depth > self.depths[index]:
+            self.keys[index] = hash_entry.zobrist
+            self.moves[index] = encode_move(hash_entry.best_move)
+            self.depths[index] = hash_entry.depth
+            self.values[index] = hash_entry.value
+            self.flags[index] = encode_flag(hash_entry.flag, hash_entry.age)
 
     def get(self, zobrist, depth):
-        index = zobrist % table_size
-
-        stored_entry = self.table[index]
+        index = zobrist % self.size
 
         # do not return entry if zobrist does not match (collision occurred)
-        if stored_entry and zobrist == stored_entry.zobrist and stored_entry.depth >= depth:
-            return stored_entry
+        if self.flags[index] and zobrist == int(self.keys[index]) and self.depths[index] >= depth:
+            return self.entry_at(index)
+
+        return None
+
+    # Permille of the table in use, estimated from the first 1000 slots (as reported by UCI "info hashfull")
+    def hashfull(self):
+        sample = self.flags[:1000]
+
+        return int(np.count_nonzero(sample) * 1000 // len(sample)) if len(sample) else 0
+
+    # Makes sure the moves of a principal variation (UCI strings, from the position on the board) are the best moves
+    # stored for their positions, so that it can be read back with get_principal_variation. Positions whose slot now
+    # holds another position get an entry that only carries the move: its bound never cuts the search short.
+    def store_principal_variation(self, board, principal_variation):
+        pushed = 0
+
+        for uci in principal_variation:
+            move = chess.Move.from_uci(uci)
+            index = board.zobrist % self.size
+
+            if self.flags[index] and board.zobrist == int(self.keys[index]):
+                self.moves[index] = encode_move(move)
+            else:
+                self.keys[index] = board.zobrist
+                self.moves[index] = encode_move(move)
+                self.depths[index] = -128
+                self.values[index] = 99999
+                self.flags[index] = encode_flag(Flag.UPPER_BOUND, board.halfmove_clock)
+
+            board.push(move)
+            pushed += 1
+
+        for _ in range(pushed):
+            board.pop()
+
+    # The principal variation, read from the best moves stored for the position on the board and the ones that follow
+    # (up to max_length moves, and stopping at a repetition)
+    def get_principal_variation(self, board, max_length = 64):
+        principal_variation = []
+        seen = set()
+
+        while len(principal_variation) < max_length and board.zobrist not in seen:
+            seen.add(board.zobrist)
+            move = self.get_best_move(board.zobrist)
+
+            if move is None or not board.is_legal(move):
+                break
+
+            principal_variation.append(move)
+            board.push(move)
+
+        for _ in principal_variation:
+            board.pop()
+
+        return principal_variation
+
+    # Best move stored for the position at any depth, used for move ordering
+    def get_best_move(self, zobrist):
+        index = zobrist % self.size
+
+        if self.flags[index] and zobrist == int(self.keys[index]):
+            return decode_move(int(self.moves[index]))
 
         return None
@@ -0,0 +1,53 @@
+import chess
+from chess.polyglot import POLYGLOT_RANDOM_ARRAY, ZobristHasher
+
+# Keys are taken from the polyglot random array, so incrementally updated hashes stay identical to chess.polyglot.zobrist_hash
+
+turn_key = POLYGLOT_RANDOM_ARRAY[780]
+hasher = ZobristHasher(POLYGLOT_RANDOM_ARRAY)
+
+def piece_key(piece_type, color, square):
+    return POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square]
+
+def castling_key(castling_rights):
+    key = 0
+
+    if castling_rights & chess.BB_H1:
+        key ^= POLYGLOT_RANDOM_ARRAY[768]
+    if castling_rights & chess.BB_A1:
+        key ^= POLYGLOT_RANDOM_ARRAY[768 + 1]
+    if castling_rights & chess.BB_H8:
+        key ^= POLYGLOT_RANDOM_ARRAY[768 + 2]
+    if castling_rights & chess.BB_A8:
+        key ^= POLYGLOT_RANDOM_ARRAY[768 + 3]
+
+    return key
+
+# The en passant file is only hashed if a pawn of the side to move is ready to capture (legality is irrelevant)
+def en_passant_key(board):
+    ep_square = board.ep_square
+
+    if ep_square is not None and chess.BB_PAWN_ATTACKS[not board.turn][ep_square] & board.pawns & board.occupied_co[board.turn]:
+        return POLYGLOT_RANDOM_ARRAY[772 + chess.square_file(ep_square)]
+
+    return 0
+
+# Castling, en passant and side to move components of the hash.
+# Castling rights are always clean after a push, so the raw rights can be used here.
+def state_key(board):
+    key = castling_key(board.castling_rights) ^ en_passant_key(board)
+
+    return key ^ turn_key if board.turn == chess.WHITE else key
+
+# Same as state_key, but for a position that was just set up (and may have unclean castling rights)
+def initial_state_key(board):
+    return hasher.hash_castling(board) ^ hasher.hash_ep_square(board) ^ hasher.hash_turn(board)
+
+def pawn_hash(board):
+    key = 0
+
+    for color in chess.COLORS:
+        for square in chess.scan_reversed(board.pawns & board.occupied_co[color]):
+            key ^= piece_key(chess.PAWN, color, square)
+
+    return key